@@ -0,0 +1,115 @@
+"""
+Géocodage en arrière-plan pour le formulaire d'ajout
+Les stratégies (requêtes candidates) d'une adresse sont lancées en parallèle dans un pool de threads partagé,
+hors du thread du script Streamlit : la session reste réactive et interroge le résultat (GeocodeJob.done())
+Le résultat retenu est le premier succès dans l'ordre de priorité : dès qu'une stratégie réussit,
+les stratégies moins précises sont annulées ; les plus précises encore en cours sont attendues
+Le seau à jetons est commun à toutes les sessions (quota du fournisseur respecté)
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+from batch_geocoding import DEFAULT_WORKERS, NOMINATIM_RATE, GeocodeCancelled, TokenBucket, rate_limited
+
+
+class GeocodeJob:
+    """Géocodage en cours d'une adresse ; result vaut (latitude, longitude, requête) ou None une fois terminé"""
+
+    def __init__(self, queries):
+        self.queries = list(queries)
+        self.result = None
+        self.started = time.monotonic()
+        self.finished = None
+        # Par stratégie : None en cours, False échec, sinon la location trouvée
+        self._outcomes = [None] * len(self.queries)
+        self._cancel = [threading.Event() for _ in self.queries]
+        self._futures = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not self.queries:
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Attend la fin du géocodage ; retourne False si le délai est dépassé"""
+        return self._done.wait(timeout)
+
+    def elapsed(self):
+        """Durée du géocodage (jusqu'à maintenant s'il est en cours)"""
+        return (self.finished or time.monotonic()) - self.started
+
+    def cancel(self):
+        """Abandonne les stratégies pas encore envoyées (ex: formulaire annulé)"""
+        with self._lock:
+            self._stop(0)
+            self._set_done()
+
+    def _set_done(self):
+        self.finished = time.monotonic()
+        self._done.set()
+
+    def _stop(self, start):
+        for position in range(start, len(self.queries)):
+            self._cancel[position].set()
+            if position < len(self._futures):
+                self._futures[position].cancel()
+
+    def _finish(self, position, location):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self._outcomes[position] = location if location is not None else False
+            if location is not None:
+                self._stop(position + 1)
+
+            for index, outcome in enumerate(self._outcomes):
+                if outcome is None:
+                    # Une stratégie plus précise n'a pas encore répondu
+                    return
+                if outcome is not False:
+                    self.result = (outcome.latitude, outcome.longitude, self.queries[index])
+                    break
+            self._stop(0)
+            self._set_done()
+
+
+class BackgroundGeocoder:
+    """Pool de threads partagé qui exécute les GeocodeJob (une instance par application)"""
+
+    def __init__(self, geolocator, cache=None, rate=NOMINATIM_RATE, workers=DEFAULT_WORKERS, timeout=10, bucket=None):
+        self.geolocator = geolocator
+        self.cache = cache
+        self.bucket = bucket or TokenBucket(rate)
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='geocode')
+
+    def submit(self, queries):
+        """Lance le géocodage des requêtes (par ordre de priorité) et retourne aussitôt le GeocodeJob"""
+        job = GeocodeJob(queries)
+        with job._lock:
+            for position, query in enumerate(job.queries):
+                job._futures.append(self.executor.submit(self._run, job, position, query))
+        return job
+
+    def _run(self, job, position, query):
+        location = None
+        cancel = job._cancel[position]
+        try:
+            if not cancel.is_set():
+                geolocator = rate_limited(self.geolocator, self.bucket, cancel)
+                if self.cache is not None:
+                    location = self.cache.geocode(geolocator, query, timeout=self.timeout)
+                else:
+                    location = geolocator.geocode(query, timeout=self.timeout)
+        except (GeocoderTimedOut, GeocoderServiceError, GeocodeCancelled):
+            location = None
+        finally:
+            # Toujours conclure la stratégie, même sur une erreur inattendue (ex: cache SQLite verrouillé),
+            # sinon le job ne se termine jamais et le formulaire attend indéfiniment
+            job._finish(position, location)
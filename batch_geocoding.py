@@ -0,0 +1,206 @@
+"""
+Géocodage par lots avec limitation de débit
+- un seau à jetons (TokenBucket) partagé par un petit groupe de threads garantit le respect du quota du fournisseur
+- les requêtes identiques de plusieurs lignes ne sont envoyées qu'une fois
+- les stratégies de repli d'une ligne sont relancées dès l'échec de la précédente, en priorité sur les nouvelles lignes
+Fonctionne avec tout géocodeur compatible geopy (méthode geocode(query, timeout=...)), y compris MockGeocoder ;
+les backends locaux (geocoders.GazetteerGeocoder) ne sont pas limités
+"""
+
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+from geocoders import FallbackGeocoder
+from geocoding import CachedLocation, geocoder_name
+
+# Limite d'usage de Nominatim : 1 requête par seconde
+NOMINATIM_RATE = 1.0
+DEFAULT_WORKERS = 4
+
+
+class TokenBucket:
+    """Seau à jetons thread-safe : au plus `rate` acquisitions par seconde, rafales limitées à `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.acquired = 0
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel=None):
+        """
+        Attend qu'un jeton soit disponible puis le consomme
+        Retourne False sans consommer de jeton si l'évènement cancel est levé pendant l'attente
+        """
+        while True:
+            if cancel is not None and cancel.is_set():
+                return False
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+
+
+class GeocodeCancelled(Exception):
+    """Requête abandonnée avant son envoi (un autre résultat a déjà été retenu)"""
+
+
+class RateLimitedGeocoder:
+    """Enveloppe un géocodeur : chaque appel réel consomme un jeton du seau partagé"""
+
+    def __init__(self, geolocator, bucket, cancel=None):
+        self.geolocator = geolocator
+        self.bucket = bucket
+        self.cancel = cancel
+
+    @property
+    def cache_name(self):
+        return geocoder_name(self.geolocator)
+
+    def geocode(self, query, **kwargs):
+        if not self.bucket.acquire(self.cancel):
+            raise GeocodeCancelled(query)
+        return self.geolocator.geocode(query, **kwargs)
+
+
+def rate_limited(geolocator, bucket, cancel=None):
+    """
+    Applique le seau à jetons aux seuls backends distants (un index local ne consomme pas de quota)
+    cancel : évènement qui abandonne la requête (GeocodeCancelled) tant qu'elle attend son jeton
+    """
+    if getattr(geolocator, 'is_local', False):
+        return geolocator
+    if isinstance(geolocator, FallbackGeocoder):
+        return FallbackGeocoder([rate_limited(backend, bucket, cancel) for backend in geolocator.backends])
+    return RateLimitedGeocoder(geolocator, bucket, cancel)
+
+
+class MockGeocoder:
+    """
+    Géocodeur local pour les tests et les benchmarks (aucun accès réseau)
+    Retourne des coordonnées déterministes dérivées de la requête, après une latence simulée
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    def geocode(self, query, timeout=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        digest = int(hashlib.md5(query.encode('utf-8')).hexdigest(), 16)
+        if (digest % 1000) / 1000 < self.failure_rate:
+            return None
+        latitude = 36 + (digest % 30000) / 1000
+        longitude = -10 + ((digest // 30000) % 40000) / 1000
+        return CachedLocation(latitude, longitude)
+
+
+class BatchGeocoder:
+    """
+    Géocode une liste de lignes, chacune décrite par ses requêtes candidates (par ordre de priorité)
+    bucket : seau à jetons partagé avec les autres géocodages du processus (sinon un seau propre au débit rate)
+    """
+
+    def __init__(self, geolocator, rate=NOMINATIM_RATE, workers=DEFAULT_WORKERS, cache=None, timeout=10, bucket=None):
+        self.bucket = bucket or TokenBucket(rate)
+        self.geolocator = rate_limited(geolocator, self.bucket)
+        self.workers = workers
+        self.cache = cache
+        self.timeout = timeout
+        self.errors = 0
+        # Requêtes en erreur (timeout, service) : un échec à réessayer plus tard, pas une adresse introuvable
+        self.errored_queries = set()
+        self._lock = threading.Lock()
+
+    @property
+    def requests(self):
+        """Nombre de requêtes réellement envoyées au fournisseur distant (par tous les utilisateurs du seau)"""
+        return self.bucket.acquired
+
+    def _resolve(self, query):
+        """Résout une requête (cache puis fournisseur) ; les erreurs réseau comptent comme un échec"""
+        try:
+            if self.cache is not None:
+                return self.cache.geocode(self.geolocator, query, timeout=self.timeout)
+            return self.geolocator.geocode(query, timeout=self.timeout)
+        except (GeocoderTimedOut, GeocoderServiceError):
+            with self._lock:
+                self.errors += 1
+                self.errored_queries.add(query)
+            return None
+
+    def geocode_all(self, query_lists, progress=None):
+        """
+        Géocode chaque liste de requêtes ; retourne une liste de (latitude, longitude, requête retenue)
+        avec (None, None, None) pour les lignes sans résultat
+        progress(index, résultat) est appelé dès qu'une ligne est terminée
+        """
+        results = [None] * len(query_lists)
+        resolved = {}   # requête -> location (ou None)
+        waiters = {}    # requête en cours -> [(ligne, niveau de stratégie)]
+        in_flight = {}  # future -> requête
+        # Les stratégies de repli passent devant les nouvelles lignes (appendleft)
+        todo = deque((i, 0) for i in range(len(query_lists)))
+
+        def finish(i, result):
+            results[i] = result
+            if progress:
+                progress(i, result)
+
+        def advance(i, level):
+            """Fait progresser la ligne i au niveau donné ; retourne la requête à envoyer, ou None"""
+            queries = query_lists[i]
+            if level >= len(queries):
+                finish(i, (None, None, None))
+                return None
+            query = queries[level]
+            if query in resolved:
+                location = resolved[query]
+                if location:
+                    finish(i, (location.latitude, location.longitude, query))
+                else:
+                    todo.appendleft((i, level + 1))
+                return None
+            if query in waiters:
+                waiters[query].append((i, level))
+                return None
+            waiters[query] = [(i, level)]
+            return query
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while todo or in_flight:
+                # Garder juste assez de requêtes en attente pour occuper les threads
+                while todo and len(in_flight) < self.workers * 2:
+                    query = advance(*todo.popleft())
+                    if query is not None:
+                        in_flight[executor.submit(self._resolve, query)] = query
+                if not in_flight:
+                    continue
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    query = in_flight.pop(future)
+                    resolved[query] = future.result()
+                    for i, level in waiters.pop(query):
+                        todo.appendleft((i, level))
+
+        return results
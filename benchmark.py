@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmarks des chemins critiques de l'application sur des données synthétiques
+Les fichiers shop.csv / master_data.csv sont générés (graine fixe) aux tailles demandées,
+avec les colonnes et les valeurs des vrais fichiers, dans un dossier temporaire
+
+Exemples :
+    python benchmark.py                          # 1 000, 10 000 et 100 000 lieux
+    python benchmark.py --sizes 1000 --repeat 5
+    python benchmark.py --output bench.jsonl     # ajoute les résultats (avec le commit) au fichier
+    python benchmark.py --baseline bench.jsonl   # compare avec les derniers résultats enregistrés
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import string
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from batch_geocoding import BatchGeocoder, MockGeocoder
+from facets import FacetIndex
+from geocode_missing import build_queries
+from map_rendering import build_feature_group, build_map, build_marker_specs
+from reference_index import REFERENCE_INDEX_COLUMNS, ReferenceIndex
+from schema import REFERENCE_FILE, SHOP_FILE, read_reference, read_shops, shop_dtypes
+from snapshot import build_snapshot, read_snapshot
+from spatial import GridIndex, NearestIndex
+from validation import normalize_shops
+
+SIZES = [1000, 10000, 100000]
+SEED = 42
+# Part des lieux sans coordonnées (à géocoder) et nombre de lignes envoyées au pipeline de géocodage
+MISSING_RATIO = 0.05
+GEOCODE_ROWS = 2000
+
+
+def _codes(n):
+    """n codes distincts de 4 lettres (AAAA, AAAB, ...)"""
+    return [''.join(letters) for letters in itertools.islice(itertools.product(string.ascii_uppercase, repeat=4), n)]
+
+
+def generate_reference(n, source):
+    """master_data.csv synthétique de n billets, construit à partir des valeurs du vrai fichier"""
+    rng = np.random.default_rng(SEED)
+    picks = source.iloc[rng.integers(0, len(source), n)].reset_index(drop=True)
+    years = rng.integers(2015, 2026, n).astype(str)
+    numbers = rng.integers(1, 10, n).astype(str)
+    df_ref = pd.DataFrame({
+        'CODE': _codes(n),
+        'YEAR': [f"{year}-{number}" for year, number in zip(years, numbers)],
+    })
+    df_ref.insert(0, '#', df_ref['CODE'] + '_' + df_ref['YEAR'])
+    df_ref.insert(1, 'AVAILABILITY', rng.random(n) < 0.3)
+    df_ref.insert(2, 'POSTAL_CODE', picks['POSTAL_CODE'])
+    for column in ['CITY', 'COUNTRY', 'TITLE', 'INFO_LINK']:
+        df_ref[column] = picks[column]
+    return df_ref[list(source.columns)]
+
+
+def generate_shops(n, df_ref, source):
+    """shop.csv synthétique de n lieux vendant des billets de df_ref, autour des villes des vrais lieux"""
+    rng = np.random.default_rng(SEED + 1)
+    billets = df_ref.iloc[rng.integers(0, len(df_ref), n)].reset_index(drop=True)
+    located = source.dropna(subset=['LATITUDE', 'LONGITUDE', 'PAYS', 'VILLE']).reset_index(drop=True)
+    places = located.iloc[rng.integers(0, len(located), n)].reset_index(drop=True)
+
+    df = pd.DataFrame({
+        '#': billets['#'],
+        'TITRE': billets['TITLE'].str.slice(0, 40),
+        'CODE': billets['CODE'],
+        'MILESIME': billets['YEAR'],
+        'PAYS': places['PAYS'],
+        'VILLE': places['VILLE'],
+        'LIEU': places['LIEU'].fillna('') + ' ' + pd.Series(np.arange(n)).astype(str),
+        'ADRESSE': places['ADRESSE'],
+        'Mode de vente': places['Mode de vente'],
+        'TYPE DE LIEU': places['TYPE DE LIEU'],
+        'COMMENTAIRE': places['COMMENTAIRE'],
+        'PRIX INDICATIF (€)': places['PRIX INDICATIF (€)'],
+        'DATE': places['DATE'],
+        'IMAGE': places['IMAGE'],
+        # Dispersion de ~10 km autour du lieu d'origine
+        'LATITUDE': (places['LATITUDE'] + rng.normal(0, 0.1, n)).round(6),
+        'LONGITUDE': (places['LONGITUDE'] + rng.normal(0, 0.1, n)).round(6),
+    })
+    missing = rng.random(n) < MISSING_RATIO
+    df.loc[missing, ['LATITUDE', 'LONGITUDE']] = np.nan
+    return df[list(source.columns)]
+
+
+def filter_display(df, pays, ville):
+    """Même filtrage que load_display() dans streamlit_app.py (mode CSV)"""
+    df_display = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    if pays is not None:
+        df_display = df_display[df_display['PAYS'] == pays]
+    if ville is not None:
+        df_display = df_display[df_display['VILLE'] == ville]
+    return df_display
+
+
+def measure(func, repeat):
+    """(meilleur temps, temps médian) en millisecondes sur repeat exécutions, après une exécution de chauffe"""
+    func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return min(durations), float(np.median(durations))
+
+
+def run_size(n, repeat, workdir):
+    """Exécute tous les benchmarks pour n lieux ; retourne une liste de (nom, meilleur, médian)"""
+    source_ref = pd.read_csv(REFERENCE_FILE)
+    source_shops = pd.read_csv(SHOP_FILE)
+    df_ref = generate_reference(max(n // 2, len(source_ref)), source_ref)
+    shops_file = os.path.join(workdir, f'shop_{n}.csv')
+    reference_file = os.path.join(workdir, f'master_data_{n}.csv')
+    generate_shops(n, df_ref, source_shops).to_csv(shops_file, index=False)
+    df_ref.to_csv(reference_file, index=False)
+
+    df = read_shops(shops_file)
+    reference = read_reference(reference_file)
+    build_snapshot(reference_file)
+    index = ReferenceIndex(reference[REFERENCE_INDEX_COLUMNS])
+    top_pays = df['PAYS'].value_counts().index[0]
+    top_ville = df.loc[df['PAYS'] == top_pays, 'VILLE'].value_counts().index[0]
+    ids = reference['#'].sample(1000, replace=True, random_state=SEED).tolist()
+    pairs = [tuple(billet_id.split('_', 1)) for billet_id in ids]
+    specs = build_marker_specs(df)
+    df_city = filter_display(df, top_pays, top_ville)
+    df_all = filter_display(df, None, None)
+    grid = GridIndex.from_dataframe(df_all)
+    nearest = NearestIndex(df)
+    centre = (float(df_city['LATITUDE'].mean()), float(df_city['LONGITUDE'].mean()))
+
+    missing = df[df['LATITUDE'].isna()].head(GEOCODE_ROWS)
+    query_lists = [
+        build_queries(row['PAYS'], row['VILLE'], row['LIEU'], row['ADRESSE'])
+        for row in missing[['PAYS', 'VILLE', 'LIEU', 'ADRESSE']].astype(object).to_dict('records')
+    ]
+
+    def geocode():
+        # Sans latence ni limite de débit : mesure le coût propre du pipeline (file, threads, repli)
+        BatchGeocoder(MockGeocoder(failure_rate=0.3), rate=1e9).geocode_all(query_lists)
+
+    benchmarks = [
+        ('load_shops_csv', lambda: read_shops(shops_file)),
+        # Chargement réel de l'application : lecture puis normalisation et contrôle qualité (read_data)
+        ('load_shops_normalized', lambda: normalize_shops(pd.read_csv(shops_file, dtype=shop_dtypes()))),
+        ('load_reference_csv', lambda: read_reference(reference_file)),
+        ('load_reference_snapshot', lambda: read_snapshot(reference_file, columns=REFERENCE_INDEX_COLUMNS)),
+        ('facets_build', lambda: FacetIndex.from_dataframe(df)),
+        ('filter_pays', lambda: filter_display(df, top_pays, None)),
+        ('filter_pays_ville', lambda: filter_display(df, top_pays, top_ville)),
+        ('reference_index_build', lambda: ReferenceIndex(reference[REFERENCE_INDEX_COLUMNS])),
+        ('reference_lookup_x1000', lambda: [index.get(billet_id) for billet_id in ids]),
+        ('reference_lookup_code_year_x1000', lambda: [index.lookup(code, year) for code, year in pairs]),
+        ('marker_specs', lambda: build_marker_specs(df)),
+        ('map_city', lambda: build_map(df_city, specs, zoom_start=13)),
+        ('map_all', lambda: build_map(df_all, specs)),
+        ('viewport_markers', lambda: build_feature_group(
+            df_all.loc[grid.query_bbox(centre[0] - 0.5, centre[1] - 0.8, centre[0] + 0.5, centre[1] + 0.8)], specs
+        )),
+        ('nearest_k10', lambda: nearest.query(*centre, k=10)),
+        ('geocode_batch', geocode),
+    ]
+    return [(name, *measure(func, repeat)) for name, func in benchmarks]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def load_baseline(path):
+    """Derniers résultats enregistrés par (taille, benchmark)"""
+    baseline = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                baseline[(record['rows'], record['benchmark'])] = record
+    return baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sur des données synthétiques")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="Nombres de lieux (défaut : 1000 10000 100000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Exécutions par mesure (défaut : 3)")
+    parser.add_argument('--output', help="Fichier JSON lines où ajouter les résultats")
+    parser.add_argument('--baseline', help="Fichier JSON lines de résultats précédents à comparer")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+    context = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+    }
+    print(f"Commit {context['commit'] or '?'} - Python {context['python']} - pandas {context['pandas']}")
+
+    records = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            print(f"\n{n} lieux")
+            print(f"{'benchmark':<36} {'min (ms)':>10} {'médiane':>10} {'vs base':>9}")
+            for name, best, median in run_size(n, args.repeat, workdir):
+                previous = baseline.get((n, name))
+                ratio = f"{best / previous['min_ms']:.2f}x" if previous and previous['min_ms'] else ''
+                print(f"{name:<36} {best:>10.2f} {median:>10.2f} {ratio:>9}")
+                records.append({**context, 'rows': n, 'benchmark': name,
+                                'min_ms': round(best, 3), 'median_ms': round(median, 3), 'repeat': args.repeat})
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"\n💾 {len(records)} résultats ajoutés à {args.output}")
+
+
+if __name__ == "__main__":
+    main()
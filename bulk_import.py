@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Import en masse de lieux depuis un fichier CSV ou JSON (page « 📥 Import en masse » ou ligne de commande)
+1. validation vectorisée : billet connu dans master_data.csv ('#' ou CODE + MILESIME), LIEU et ADRESSE renseignés,
+   coordonnées valides ; TITRE / PAYS / VILLE complétés depuis le billet
+2. dédoublonnage sur ('#', LIEU, ADRESSE) avec les lieux existants et à l'intérieur du fichier
+3. géocodage des coordonnées manquantes par lots (BatchGeocoder, cache partagé)
+4. ajout de toutes les lignes en une seule écriture atomique de shop.csv
+
+Utilisation :
+    python bulk_import.py nouveaux_lieux.csv
+    python bulk_import.py partenaire.json --dry-run
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from batch_geocoding import BatchGeocoder, NOMINATIM_RATE
+from duplicates import DuplicateIndex
+from geocode_missing import build_queries
+from geocoders import get_geocoder
+from geocoding import GeocodeCache
+from schema import DATE_FORMAT, REFERENCE_FILE, SHOP_FILE
+from storage import append_rows, read_header
+
+# Colonnes complétées depuis le billet de référence quand elles sont vides
+FROM_REFERENCE = {'TITRE': 'TITLE', 'PAYS': 'COUNTRY', 'VILLE': 'CITY'}
+
+
+def read_upload(source, name=None):
+    """
+    Lit un fichier CSV ou JSON (liste d'objets, ou {"rows": [...]}) ; chemin ou fichier ouvert
+    Toutes les valeurs sont lues comme du texte
+    """
+    name = name or getattr(source, 'name', None) or str(source)
+    if name.lower().endswith('.json'):
+        if isinstance(source, str):
+            with open(source, encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            data = json.load(source)
+        if isinstance(data, dict):
+            data = data.get('rows', [])
+        return pd.DataFrame(data).astype('string')
+    return pd.read_csv(source, dtype='string', keep_default_na=False)
+
+
+def normalize_columns(df, columns):
+    """Renomme les colonnes reconnues (sans tenir compte de la casse) et ajoute les colonnes absentes"""
+    by_upper = {column.upper(): column for column in columns}
+    df = df.rename(columns=lambda column: by_upper.get(str(column).strip().upper(), column))
+    return df.reindex(columns=columns)
+
+
+def _clean(series):
+    """Texte sans espaces superflus ; chaîne vide -> valeur manquante"""
+    series = series.astype('string').str.strip()
+    return series.mask(series == '')
+
+
+def prepare_import(df_new, df_shops, df_ref, columns, today=None):
+    """
+    Valide et complète les lignes à importer (opérations vectorisées sur tout le fichier,
+    puis recherche des doublons ligne par ligne dans l'index des lieux existants)
+    Retourne (lignes acceptées, lignes rejetées avec une colonne RAISON)
+    """
+    df = normalize_columns(df_new, columns)
+    for column in df.columns:
+        df[column] = _clean(df[column])
+
+    # Identifiant du billet : '#' fourni, sinon CODE_MILESIME
+    df['CODE'] = df['CODE'].str.upper()
+    df['#'] = df['#'].fillna(df['CODE'] + '_' + df['MILESIME'])
+    code_year = df['#'].str.split('_', n=1, expand=True).reindex(columns=[0, 1])
+    df['CODE'] = df['CODE'].fillna(code_year[0])
+    df['MILESIME'] = df['MILESIME'].fillna(code_year[1])
+
+    reference = df_ref.drop_duplicates('#').set_index('#')
+    known = df['#'].isin(reference.index)
+    for column, ref_column in FROM_REFERENCE.items():
+        df[column] = df[column].fillna(df['#'].map(reference[ref_column].astype('string')))
+
+    latitude = pd.to_numeric(df['LATITUDE'], errors='coerce').astype(float)
+    longitude = pd.to_numeric(df['LONGITUDE'], errors='coerce').astype(float)
+    bad_coords = (
+        (df['LATITUDE'].notna() & (latitude.isna() | ~latitude.between(-90, 90)))
+        | (df['LONGITUDE'].notna() & (longitude.isna() | ~longitude.between(-180, 180)))
+    )
+    df['LATITUDE'], df['LONGITUDE'] = latitude, longitude
+    df['DATE'] = df['DATE'].fillna(today or datetime.now().strftime(DATE_FORMAT))
+
+    # Première raison de rejet de chaque ligne ('' = ligne acceptée)
+    reason = np.select(
+        [~known, df['LIEU'].isna() | df['ADRESSE'].isna(), bad_coords],
+        ["Billet inconnu", "LIEU ou ADRESSE manquant", "Coordonnées invalides"],
+        default='',
+    ).astype(object)
+
+    # Doublons (même billet au même lieu ou aux mêmes coordonnées), avec les règles du formulaire d'ajout
+    existing, seen = DuplicateIndex(df_shops), DuplicateIndex()
+    candidates = np.flatnonzero(reason == '')
+    for position, row in zip(candidates, df.iloc[candidates].to_dict('records')):
+        if existing.find(row):
+            reason[position] = "Déjà présent"
+        elif seen.find(row):
+            reason[position] = "Doublon dans le fichier"
+        else:
+            seen.add_row(row)
+    rejected = reason != ''
+    return df[~rejected].reset_index(drop=True), df[rejected].assign(RAISON=reason[rejected])
+
+
+def geocode_rows(df, geolocator, cache=None, rate=NOMINATIM_RATE, progress=None, bucket=None):
+    """
+    Complète sur place les coordonnées manquantes de df par géocodage par lots
+    progress(terminées, total) est appelé après chaque ligne ; retourne le nombre de lignes géocodées
+    bucket : seau à jetons partagé (application : le même que le formulaire d'ajout)
+    """
+    missing = df.index[df['LATITUDE'].isna() | df['LONGITUDE'].isna()]
+    if len(missing) == 0:
+        return 0
+    rows = df.loc[missing, ['PAYS', 'VILLE', 'LIEU', 'ADRESSE']].astype(object).where(lambda d: d.notna(), None)
+    query_lists = [build_queries(*values) for values in rows.itertuples(index=False)]
+
+    finished = [0]
+
+    def report(position, result):
+        finished[0] += 1
+        if progress:
+            progress(finished[0], len(query_lists))
+
+    results = BatchGeocoder(geolocator, rate=rate, cache=cache, bucket=bucket).geocode_all(query_lists, progress=report)
+    geocoded = 0
+    for index, (lat, lon, query) in zip(missing, results):
+        if lat is not None and lon is not None:
+            df.at[index, 'LATITUDE'] = lat
+            df.at[index, 'LONGITUDE'] = lon
+            geocoded += 1
+    return geocoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse de lieux (CSV ou JSON)")
+    parser.add_argument('file', help="Fichier CSV ou JSON des lieux à importer")
+    parser.add_argument('--shops', default=SHOP_FILE, help=f"CSV des lieux (défaut : {SHOP_FILE})")
+    parser.add_argument('--reference', default=REFERENCE_FILE, help=f"CSV des billets (défaut : {REFERENCE_FILE})")
+    parser.add_argument('--no-geocode', action='store_true', help="Ne pas géocoder les lignes sans coordonnées")
+    parser.add_argument('--dry-run', action='store_true', help="Valider sans rien écrire")
+    args = parser.parse_args()
+
+    print(f"📂 Lecture de {args.file}...")
+    df_new = read_upload(args.file)
+    df_shops = pd.read_csv(args.shops)
+    df_ref = pd.read_csv(args.reference, usecols=['#', 'TITLE', 'CITY', 'COUNTRY'])
+    accepted, rejected = prepare_import(df_new, df_shops, df_ref, read_header(args.shops))
+
+    print(f"✓ {len(accepted)} lignes valides, ✗ {len(rejected)} rejetées")
+    if len(rejected):
+        print(rejected[['#', 'LIEU', 'ADRESSE', 'RAISON']].to_string())
+    if len(accepted) == 0:
+        return
+
+    if not args.no_geocode:
+        backend = os.environ.get('GEOCODER_BACKEND', 'nominatim')
+        print(f"\n🌍 Géocodage des coordonnées manquantes ({backend})...")
+
+        def report(done, total):
+            print(f"  [{done}/{total}]", end='\r', flush=True)
+
+        geocoded = geocode_rows(accepted, get_geocoder(backend), cache=GeocodeCache(), progress=report)
+        print(f"\n✓ {geocoded} lignes géocodées")
+
+    if args.dry_run:
+        print("\n(--dry-run) Aucune modification n'a été apportée.")
+        return
+    append_rows(accepted, args.shops)
+    print(f"\n💾 {len(accepted)} lieux ajoutés à {args.shops}")
+
+
+if __name__ == "__main__":
+    main()
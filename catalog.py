@@ -0,0 +1,68 @@
+"""
+Vue jointe des lieux et des billets de référence (shop.csv x master_data.csv sur '#')
+La jointure est faite une seule fois par version des données, et seulement quand un filtre sur les billets
+est actif, avec des index précalculés :
+- lieux dont le billet est encore disponible (AVAILABILITY)
+- lieux par année du millésime
+Les filtres « disponibles uniquement » / « par année » sont alors de simples sélections de positions,
+sans refaire de jointure (en mode SQLite, ils sont appliqués dans la requête, voir database.py)
+La couverture (nombre de lieux par billet) est calculée à partir de simples comptages par '#'
+"""
+
+import numpy as np
+
+# Colonnes de master_data.csv ajoutées aux lieux
+JOIN_COLUMNS = ['AVAILABILITY', 'POSTAL_CODE', 'YEAR', 'INFO_LINK']
+# Colonnes de master_data.csv utilisées par la vue de couverture
+COVERAGE_COLUMNS = ['#', 'TITLE', 'CITY', 'COUNTRY', 'YEAR', 'AVAILABILITY']
+
+
+def shop_years(df_shops):
+    """Années des millésimes des lieux (colonne texte 'aaaa', valeurs manquantes si vide)"""
+    return df_shops['MILESIME'].astype('string').str.slice(0, 4)
+
+
+class ShopCatalog:
+    """Lieux joints à leur billet de référence, avec index par disponibilité et par année"""
+
+    def __init__(self, df_shops, df_ref):
+        reference = df_ref.drop_duplicates('#').set_index('#')
+        self.df = df_shops.join(reference[JOIN_COLUMNS], on='#')
+
+        year = shop_years(self.df)
+        self.available = self.df['AVAILABILITY'].fillna(False).astype(bool).to_numpy()
+        self._by_year = dict(year.groupby(year).indices)
+
+    def positions(self, available_only=False, year=None):
+        """Positions des lieux retenus par les filtres (tableau trié)"""
+        if year is not None:
+            positions = self._by_year.get(year, np.array([], dtype=np.intp))
+        else:
+            positions = np.arange(len(self.df))
+        if available_only:
+            positions = positions[self.available[positions]]
+        return positions
+
+    def select(self, available_only=False, year=None):
+        """Étiquettes (index) des lieux retenus, pour df.loc[...] sur le DataFrame des lieux"""
+        return self.df.index[self.positions(available_only, year)]
+
+
+def coverage_table(df_ref, counts):
+    """
+    Nombre de lieux par billet de référence, du plus couvert au moins couvert
+    counts : nombre de lieux par '#' (Series, value_counts ou GROUP BY SQL)
+    """
+    coverage = df_ref[COVERAGE_COLUMNS].drop_duplicates('#')
+    return coverage.assign(
+        LIEUX=coverage['#'].map(counts).fillna(0).astype('int64')
+    ).sort_values(['LIEUX', '#'], ascending=[False, True], ignore_index=True)
+
+
+def filter_coverage(coverage, available_only=False, year=None):
+    """Billets encore disponibles et/ou d'une année, si demandé"""
+    if available_only:
+        coverage = coverage[coverage['AVAILABILITY']]
+    if year is not None:
+        coverage = coverage[coverage['YEAR'].str.startswith(year)]
+    return coverage
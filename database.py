@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Stockage SQLite optionnel des lieux (shops) et des billets de référence (reference)
+Les filtres pays/ville et les listes de valeurs distinctes sont calculés par SQL, avec index,
+au lieu de charger les CSV entiers en mémoire à chaque session
+
+Migration depuis les CSV :
+    python database.py migrate
+Export vers shop.csv (par exemple avant un commit des données) :
+    python database.py export
+"""
+
+import argparse
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import pandas as pd
+
+from facets import FACET_COLUMNS
+from schema import REFERENCE_FILE, SHOP_FILE
+from storage import write_shops
+from validation import clean_text
+
+DB_FILE = 'data/euro_souvenir.sqlite'
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_shops_pays ON shops ("PAYS")',
+    'CREATE INDEX IF NOT EXISTS idx_shops_pays_ville ON shops ("PAYS", "VILLE")',
+    'CREATE INDEX IF NOT EXISTS idx_shops_ville ON shops ("VILLE")',
+    'CREATE INDEX IF NOT EXISTS idx_shops_id ON shops ("#")',
+    'CREATE INDEX IF NOT EXISTS idx_shops_coords ON shops ("LATITUDE", "LONGITUDE")',
+    'CREATE INDEX IF NOT EXISTS idx_reference_id ON reference ("#")',
+    'CREATE INDEX IF NOT EXISTS idx_reference_code_year ON reference ("CODE", "YEAR")',
+]
+
+# Compteur de modifications par table : l'application ne relit que la table modifiée (voir datastore.py)
+VERSIONS_TABLE = 'CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+
+
+def quote(column):
+    """Nom de colonne entre guillemets (les colonnes du CSV contiennent espaces et symboles)"""
+    return '"' + column.replace('"', '""') + '"'
+
+
+class ShopDatabase:
+    """Accès à la base SQLite ; une connexion courte par opération (utilisable depuis plusieurs threads)"""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+
+    @contextmanager
+    def _connect(self):
+        """Connexion validée (commit) à la sortie du bloc puis fermée"""
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def _values(self, sql, params=()):
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(sql, params)]
+
+    @staticmethod
+    def _bump(conn, *tables):
+        """Incrémente le compteur de modifications des tables, dans la transaction de l'écriture"""
+        conn.execute(VERSIONS_TABLE)
+        for table in tables:
+            conn.execute(
+                'INSERT INTO table_versions (name, version) VALUES (?, 1)'
+                ' ON CONFLICT(name) DO UPDATE SET version = version + 1',
+                (table,)
+            )
+
+    @staticmethod
+    def _version(conn, table):
+        conn.execute(VERSIONS_TABLE)
+        row = conn.execute('SELECT version FROM table_versions WHERE name = ?', (table,)).fetchone()
+        return row[0] if row else 0
+
+    def table_version(self, table):
+        """Compteur de modifications d'une table (0 si elle n'a jamais été écrite par ShopDatabase)"""
+        with self._connect() as conn:
+            return self._version(conn, table)
+
+    def create_indexes(self):
+        with self._connect() as conn:
+            for statement in INDEXES:
+                conn.execute(statement)
+
+    def import_dataframes(self, df_shops, df_ref):
+        """Remplace le contenu de la base par les deux DataFrames et crée les index"""
+        with self._connect() as conn:
+            df_shops.to_sql('shops', conn, if_exists='replace', index=False)
+            df_ref.to_sql('reference', conn, if_exists='replace', index=False)
+            self._bump(conn, 'shops', 'reference')
+        self.create_indexes()
+
+    def append_shop(self, row):
+        """
+        Insère un lieu (dict colonne -> valeur)
+        Retourne le compteur de la table juste avant et juste après l'insertion (lu dans la même transaction)
+        """
+        columns = list(row)
+        sql = (
+            f"INSERT INTO shops ({', '.join(quote(c) for c in columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        with self._connect() as conn:
+            # L'insertion prend le verrou d'écriture : aucune autre écriture ne peut passer avant la lecture du compteur
+            conn.execute(sql, [row[c] for c in columns])
+            before = self._version(conn, 'shops')
+            self._bump(conn, 'shops')
+        return before, before + 1
+
+    def append_shops(self, df):
+        """Insère plusieurs lieux dans une seule transaction"""
+        with self._connect() as conn:
+            df.to_sql('shops', conn, if_exists='append', index=False)
+            self._bump(conn, 'shops')
+
+    def shops(self, pays=None, ville=None, with_coords=False, available_only=False, year=None):
+        """
+        Lieux filtrés par pays / ville (None = pas de filtre)
+        available_only : seulement les billets encore disponibles ; year : année du millésime ('aaaa')
+        """
+        conditions = []
+        params = []
+        if pays is not None:
+            conditions.append('"PAYS" = ?')
+            params.append(pays)
+        if ville is not None:
+            conditions.append('"VILLE" = ?')
+            params.append(ville)
+        if with_coords:
+            conditions.append('"LATITUDE" IS NOT NULL AND "LONGITUDE" IS NOT NULL')
+        if available_only:
+            conditions.append('"#" IN (SELECT "#" FROM reference WHERE "AVAILABILITY")')
+        if year is not None:
+            conditions.append('substr("MILESIME", 1, 4) = ?')
+            params.append(year)
+        sql = 'SELECT * FROM shops'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return self._query(sql, params)
+
+    def years(self):
+        """Années distinctes des millésimes des lieux"""
+        return sorted(self._values(
+            'SELECT DISTINCT substr("MILESIME", 1, 4) FROM shops WHERE "MILESIME" IS NOT NULL AND "MILESIME" != \'\''
+        ))
+
+    def note_counts(self):
+        """Nombre de lieux par billet ('#')"""
+        counts = self._query('SELECT "#", COUNT(*) AS N FROM shops WHERE "#" IS NOT NULL GROUP BY "#"')
+        return counts.set_index('#')['N']
+
+    def facet_counts(self):
+        """
+        Nombre de lieux par (PAYS, VILLE, TYPE DE LIEU, Mode de vente, HAS_COORDS), voir facets.py
+        Les valeurs sont normalisées comme au chargement des CSV (validation.py), puis les groupes fusionnés
+        """
+        counts = self._query(
+            'SELECT "PAYS", "VILLE", "TYPE DE LIEU", "Mode de vente",'
+            ' ("LATITUDE" IS NOT NULL AND "LONGITUDE" IS NOT NULL) AS HAS_COORDS, COUNT(*) AS N'
+            ' FROM shops GROUP BY 1, 2, 3, 4, 5'
+        )
+        for column in FACET_COLUMNS:
+            counts[column] = clean_text(counts[column])
+        return counts.groupby(FACET_COLUMNS + ['HAS_COORDS'], dropna=False).sum().reset_index()
+
+    def reference(self):
+        """Tous les billets de référence"""
+        df_ref = self._query('SELECT * FROM reference')
+        df_ref['AVAILABILITY'] = df_ref['AVAILABILITY'].astype(bool)
+        return df_ref
+
+
+def migrate(shops_file=SHOP_FILE, reference_file=REFERENCE_FILE, db_file=DB_FILE):
+    """Crée (ou recrée) la base SQLite à partir des fichiers CSV"""
+    df_shops = pd.read_csv(shops_file)
+    df_ref = pd.read_csv(reference_file)
+    ShopDatabase(db_file).import_dataframes(df_shops, df_ref)
+    return len(df_shops), len(df_ref)
+
+
+def export(db_file=DB_FILE, shops_file=SHOP_FILE):
+    """Réécrit shop.csv à partir de la base SQLite"""
+    df_shops = ShopDatabase(db_file).shops()
+    write_shops(df_shops, shops_file)
+    return len(df_shops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Base SQLite des lieux et billets de référence")
+    parser.add_argument('command', choices=['migrate', 'export'], help="migrate : CSV -> SQLite, export : SQLite -> shop.csv")
+    parser.add_argument('--db', default=DB_FILE, help=f"Fichier SQLite (défaut : {DB_FILE})")
+    parser.add_argument('--shops', default=SHOP_FILE, help=f"CSV des lieux (défaut : {SHOP_FILE})")
+    parser.add_argument('--reference', default=REFERENCE_FILE, help=f"CSV des billets (défaut : {REFERENCE_FILE})")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        if os.path.exists(args.db):
+            print(f"⚠ {args.db} existe déjà, ses tables vont être remplacées.")
+        n_shops, n_ref = migrate(args.shops, args.reference, args.db)
+        print(f"✓ {n_shops} lieux et {n_ref} billets importés dans {args.db}")
+    else:
+        n_shops = export(args.db, args.shops)
+        print(f"✓ {n_shops} lieux exportés vers {args.shops}")
+
+
+if __name__ == "__main__":
+    main()
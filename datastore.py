@@ -0,0 +1,156 @@
+"""
+Données partagées par toutes les sessions de l'application (une seule copie par processus)
+Chaque source (shop.csv, master_data.csv ou la base SQLite) est surveillée : date de modification et taille,
+puis empreinte SHA-256 quand elles changent (un fichier réécrit à l'identique n'est pas relu)
+Une source peut aussi fournir son propre signal de changement (ex: compteur par table SQLite)
+Seule la source modifiée est relue et son numéro de version est incrémenté : les caches dérivés
+utilisent ce numéro dans leur clé, les modifications externes (ex: geocode_missing.py) sont vues au rerun suivant
+"""
+
+import threading
+
+from snapshot import file_sha256
+from storage import file_stamp
+
+
+class DataSource:
+    """Une source surveillée : fichier (ou signal de changement), fonction de chargement, données en mémoire et version"""
+
+    def __init__(self, path, load, on_change=None, stamp=None):
+        self.path = path
+        self.load = load
+        self.on_change = on_change
+        # Sans signal propre : date et taille du fichier, confirmées par son empreinte
+        self.stamp_func = stamp or (lambda: file_stamp(path))
+        self.hashed = stamp is None
+        self.version = 0
+        self.stamp = None
+        # Empreinte du fichier lu (None = inconnue, toute modification entraîne une relecture)
+        self.digest = None
+        self.data = None
+        self.lock = threading.Lock()
+
+    def _changed(self):
+        """Vérifie le fichier ; retourne True si la version a changé (à appeler sous le verrou)"""
+        stamp = self.stamp_func()
+        if self.version and stamp == self.stamp:
+            return False
+        if (
+            self.version and self.hashed and stamp is not None
+            and self.digest is not None and file_sha256(self.path) == self.digest
+        ):
+            # Même contenu (fichier touché ou réécrit à l'identique)
+            self.stamp = stamp
+            return False
+        self.stamp = stamp
+        self.digest = None
+        self.data = None
+        self.version += 1
+        return True
+
+
+class DataStore:
+    """Sources de données partagées, rechargées indépendamment quand leur fichier change"""
+
+    def __init__(self):
+        self._sources = {}
+
+    def watch(self, name, path, load, on_change=None, stamp=None):
+        """
+        Déclare une source : load() retourne ses données, on_change(version) est appelé
+        quand une nouvelle version est publiée (ex: pour libérer les caches dérivés de l'ancienne)
+        stamp() : signal de changement propre à la source, à la place de la surveillance du fichier path
+        """
+        self._sources[name] = DataSource(path, load, on_change, stamp)
+
+    def version(self, name):
+        """Numéro de version courant de la source (le fichier est vérifié à chaque appel)"""
+        source = self._sources[name]
+        with source.lock:
+            changed = source._changed()
+            version = source.version
+        if changed and source.on_change:
+            source.on_change(version)
+        return version
+
+    def get(self, name):
+        """Données de la version courante de la source, chargées une seule fois"""
+        source = self._sources[name]
+        with source.lock:
+            changed = source._changed()
+            if source.data is None:
+                # Empreinte prise avant la lecture : une écriture pendant la lecture sera vue au prochain appel
+                source.digest = file_sha256(source.path) if source.hashed and source.stamp is not None else None
+                source.data = source.load()
+            data, version = source.data, source.version
+        if changed and source.on_change:
+            source.on_change(version)
+        return data
+
+    def apply(self, name, write, update):
+        """
+        Exécute write() (écriture dans la source) puis applique update(données) -> données en mémoire,
+        sans relire la source
+        write() retourne le signal de changement juste avant et juste après l'écriture, pris sous le verrou
+        de l'écriture : si la source avait changé depuis sa lecture (ex: autre processus), elle sera relue
+        au prochain accès
+        Retourne (version avant, version après)
+        """
+        source = self._sources[name]
+        with source.lock:
+            old_version = source.version
+            before, after = write()
+            if source.data is not None and before == source.stamp:
+                source.data = update(source.data)
+                source.stamp = after
+                source.digest = None
+                source.version += 1
+            else:
+                source.stamp = None
+                source._changed()
+            new_version = source.version
+        if source.on_change:
+            source.on_change(new_version)
+        return old_version, new_version
+
+    def reset(self, name):
+        """Oublie les données de la source (elles seront relues), par exemple après une réécriture complète"""
+        source = self._sources[name]
+        with source.lock:
+            source.stamp = None
+            source._changed()
+            version = source.version
+        if source.on_change:
+            source.on_change(version)
+        return version
+
+
+class IndexCache:
+    """
+    Garde l'index dérivé des lieux pour la version courante des données (partagé entre les sessions)
+    factory(données) construit l'index ; un ajout de lieu le met à jour sur place (index.add_row)
+    au lieu de le reconstruire
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.version = None
+        self.index = None
+        self._lock = threading.Lock()
+
+    def get(self, version, load):
+        """Retourne l'index pour cette version, en le reconstruisant avec factory(load()) si besoin"""
+        with self._lock:
+            if self.index is None or self.version != version:
+                self.index = self.factory(load())
+                self.version = version
+            return self.index
+
+    def add_row(self, row, old_version, new_version):
+        """Applique un ajout ; si l'index n'était pas à jour (autre écriture entre-temps), il sera reconstruit"""
+        with self._lock:
+            if self.index is not None and self.version == old_version:
+                self.index.add_row(row)
+                self.version = new_version
+            else:
+                self.index = None
@@ -0,0 +1,103 @@
+"""
+Index de détection des doublons avant l'ajout d'un lieu
+Un lieu est considéré comme un doublon si le même billet ('#') est déjà référencé :
+- au même endroit (LIEU et ADRESSE en minuscules, espaces normalisés)
+- ou aux mêmes coordonnées (arrondies à COORDINATE_DECIMALS décimales, ~10 m)
+Les clés sont dans des ensembles : la vérification d'une saisie est en O(1)
+L'index garde aussi le plus grand identifiant numérique, pour attribuer un '#' sans parcourir les lieux
+"""
+
+import numpy as np
+import pandas as pd
+
+COORDINATE_DECIMALS = 4
+
+
+def normalize_text(value):
+    """Texte en minuscules, espaces normalisés ('' pour une valeur manquante)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    return ' '.join(str(value).lower().split())
+
+
+def place_keys(df):
+    """Colonne des clés 'lieu|adresse' normalisées (opération vectorisée, même résultat que normalize_text)"""
+    parts = [
+        df[column].astype('string').fillna('').str.lower().str.split().str.join(' ')
+        for column in ['LIEU', 'ADRESSE']
+    ]
+    return parts[0] + '|' + parts[1]
+
+
+def _coordinate(value):
+    """Coordonnée arrondie, en entier (None si absente ou invalide)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if np.isnan(value):
+        return None
+    return int(round(value * 10 ** COORDINATE_DECIMALS))
+
+
+def _numeric_id(value):
+    """Identifiant numérique (ex: '12'), None pour un identifiant CODE_MILESIME"""
+    text = normalize_text(value)
+    return int(text) if text.isdigit() else None
+
+
+class DuplicateIndex:
+    """Clés (billet, lieu) et (billet, coordonnées) des lieux existants, et plus grand identifiant numérique"""
+
+    def __init__(self, df=None):
+        self.places = set()
+        self.coordinates = set()
+        self.max_id = 0
+        if df is not None and len(df):
+            ids = df['#'].astype('string').fillna('').str.lower().str.split().str.join(' ')
+            places = place_keys(df)
+            filled = places != '|'
+            self.places.update(zip(ids[filled], places[filled]))
+
+            scale = 10 ** COORDINATE_DECIMALS
+            latitude = (df['LATITUDE'].astype('float64') * scale).round()
+            longitude = (df['LONGITUDE'].astype('float64') * scale).round()
+            located = latitude.notna() & longitude.notna()
+            self.coordinates.update(zip(
+                ids[located], latitude[located].astype('int64'), longitude[located].astype('int64')
+            ))
+
+            numbers = pd.to_numeric(ids.where(ids.str.fullmatch(r'\d+')), errors='coerce')
+            if numbers.notna().any():
+                self.max_id = int(numbers.max())
+
+    def _keys(self, row):
+        billet = normalize_text(row.get('#'))
+        place = normalize_text(row.get('LIEU')) + '|' + normalize_text(row.get('ADRESSE'))
+        latitude, longitude = _coordinate(row.get('LATITUDE')), _coordinate(row.get('LONGITUDE'))
+        place_key = (billet, place) if place != '|' else None
+        coordinate_key = (billet, latitude, longitude) if latitude is not None and longitude is not None else None
+        return place_key, coordinate_key
+
+    def find(self, row):
+        """Retourne la raison si row (dict colonne -> valeur) est un doublon d'un lieu existant, sinon None"""
+        place_key, coordinate_key = self._keys(row)
+        if place_key in self.places:
+            return "Ce billet est déjà référencé à ce lieu et cette adresse"
+        if coordinate_key in self.coordinates:
+            return "Ce billet est déjà référencé à ces coordonnées"
+        return None
+
+    def next_id(self):
+        """Identifiant numérique pour un lieu sans CODE / MILLÉSIME"""
+        return self.max_id + 1
+
+    def add_row(self, row):
+        place_key, coordinate_key = self._keys(row)
+        if place_key is not None:
+            self.places.add(place_key)
+        if coordinate_key is not None:
+            self.coordinates.add(coordinate_key)
+        number = _numeric_id(row.get('#'))
+        if number is not None:
+            self.max_id = max(self.max_id, number)
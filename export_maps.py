@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Export statique des cartes : une par pays et une pour « Tous », en HTML autonome (Folium) et en GeoJSON
+Les fichiers peuvent être servis tels quels (CDN, serveur web, consultation hors ligne),
+sans construire de carte en Python à chaque visite
+
+L'export est incrémental : une empreinte des lignes de chaque pays est gardée dans manifest.json,
+seuls les pays dont les lieux ont changé (et « Tous ») sont régénérés
+
+Utilisation :
+    python export_maps.py                        # export dans data/exports/
+    python export_maps.py --output public/cartes
+    python export_maps.py --force                # tout régénérer
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import unicodedata
+from datetime import datetime
+
+import pandas as pd
+
+from map_rendering import CLUSTER_COLUMNS, build_map, build_marker_specs
+from schema import SHOP_FILE, read_shops
+from validation import normalize_shops
+
+EXPORT_DIR = 'data/exports'
+MANIFEST_FILE = 'manifest.json'
+ALL = 'Tous'
+# À incrémenter quand le rendu des cartes change : tous les fichiers sont alors régénérés
+EXPORT_VERSION = 1
+
+
+def slugify(name):
+    """Nom de fichier à partir d'un nom de pays (ex: 'Royaume‑Uni' -> 'royaume-uni')"""
+    letters = ''.join(c for c in unicodedata.normalize('NFKD', name.lower()) if not unicodedata.combining(c))
+    return re.sub(r'[^a-z0-9]+', '-', letters).strip('-') or 'pays'
+
+
+def rows_digest(df):
+    """Empreinte du contenu des lieux (valeurs et ordre des lignes)"""
+    hashes = pd.util.hash_pandas_object(df.astype(object), index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def to_geojson(df, specs):
+    """FeatureCollection GeoJSON des lieux de df (un point par lieu, champs de la popup en propriétés)"""
+    properties = df[['PAYS'] + CLUSTER_COLUMNS].astype(object).where(df[['PAYS'] + CLUSTER_COLUMNS].notna(), None)
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {**record, 'color': color},
+        }
+        for lat, lon, color, record in zip(
+            specs['LATITUDE'], specs['LONGITUDE'], specs['color'], properties.to_dict('records')
+        )
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _replace(path, write):
+    """Écrit via write(chemin temporaire) puis remplace path (jamais de fichier à moitié écrit servi)"""
+    tmp_path = path + '.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    _replace(path, write)
+
+
+def export_group(df, specs, output, slug):
+    """Écrit <slug>.html et <slug>.geojson pour les lieux de df ; retourne les noms des fichiers"""
+    html_file, geojson_file = f'{slug}.html', f'{slug}.geojson'
+    m = build_map(df, specs, zoom_start=6)
+    _replace(os.path.join(output, html_file), m.save)
+    write_json(os.path.join(output, geojson_file), to_geojson(df, specs))
+    return html_file, geojson_file
+
+
+def load_manifest(output):
+    """Manifeste de l'export précédent (vide s'il n'existe pas ou si le rendu a changé)"""
+    try:
+        with open(os.path.join(output, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return manifest.get('groups', {}) if manifest.get('version') == EXPORT_VERSION else {}
+
+
+def write_index(output, groups):
+    """Page index.html listant les cartes exportées"""
+    names = [ALL] + sorted(name for name in groups if name != ALL)
+    items = ''.join(
+        f'<li><a href="{groups[name]["html"]}">{html.escape(name)}</a> ({groups[name]["rows"]} lieux)'
+        f' - <a href="{groups[name]["geojson"]}">GeoJSON</a></li>\n'
+        for name in names if name in groups
+    )
+    page = (
+        '<!DOCTYPE html>\n<html lang="fr"><head><meta charset="utf-8">'
+        '<title>Carte des Billets 0 Euro Souvenirs</title></head>\n<body>\n'
+        '<h1>💶 Carte des Billets 0 Euro Souvenirs</h1>\n<ul>\n' + items + '</ul>\n</body></html>\n'
+    )
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(page)
+    _replace(os.path.join(output, 'index.html'), write)
+
+
+def export_maps(shops_file=SHOP_FILE, output=EXPORT_DIR, force=False, log=print):
+    """Exporte les cartes des pays modifiés (tous si force) ; retourne (régénérées, inchangées)"""
+    os.makedirs(output, exist_ok=True)
+    df = normalize_shops(read_shops(shops_file))[0]
+    df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    specs = build_marker_specs(df)
+    previous = {} if force else load_manifest(output)
+
+    groups = {ALL: df}
+    for pays, df_pays in df.groupby('PAYS', observed=True, sort=True):
+        groups[str(pays)] = df_pays
+
+    manifest, exported, unchanged = {}, [], []
+    for name, df_group in groups.items():
+        digest = rows_digest(df_group)
+        entry = previous.get(name)
+        if (
+            entry and entry['digest'] == digest
+            and os.path.exists(os.path.join(output, entry['html']))
+            and os.path.exists(os.path.join(output, entry['geojson']))
+        ):
+            manifest[name] = entry
+            unchanged.append(name)
+            continue
+
+        slug = 'tous' if name == ALL else slugify(name)
+        html_file, geojson_file = export_group(df_group, specs.loc[df_group.index], output, slug)
+        manifest[name] = {
+            'digest': digest,
+            'rows': len(df_group),
+            'html': html_file,
+            'geojson': geojson_file,
+            'exported': datetime.now().isoformat(timespec='seconds'),
+        }
+        exported.append(name)
+        log(f"  ✓ {name} ({len(df_group)} lieux)")
+
+    # Pays qui n'ont plus de lieux : fichiers supprimés
+    for name, entry in previous.items():
+        if name not in manifest:
+            for file in (entry['html'], entry['geojson']):
+                path = os.path.join(output, file)
+                if os.path.exists(path):
+                    os.remove(path)
+            log(f"  ✗ {name} (plus aucun lieu)")
+
+    write_index(output, manifest)
+    write_json(os.path.join(output, MANIFEST_FILE), {'version': EXPORT_VERSION, 'groups': manifest})
+    return exported, unchanged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export statique des cartes par pays (HTML et GeoJSON)")
+    parser.add_argument('--csv', default=SHOP_FILE, help=f"CSV des lieux (défaut : {SHOP_FILE})")
+    parser.add_argument('--output', default=EXPORT_DIR, help=f"Dossier de sortie (défaut : {EXPORT_DIR})")
+    parser.add_argument('--force', action='store_true', help="Régénérer toutes les cartes")
+    args = parser.parse_args()
+
+    print(f"🗺️  Export des cartes de {args.csv} vers {args.output}/")
+    exported, unchanged = export_maps(args.csv, args.output, args.force)
+    print(f"\n✓ {len(exported)} cartes régénérées, {len(unchanged)} inchangées")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Index des facettes des lieux : listes des pays / villes / types / modes de vente et statistiques
+Construit une fois par version des données à partir de comptages agrégés
+(groupby pandas ou GROUP BY SQL), puis mis à jour sur place lors de l'ajout d'un lieu
+Les listes des filtres et les métriques de la sidebar sont alors de simples lectures
+"""
+
+import bisect
+from collections import Counter
+
+import pandas as pd
+
+FACET_COLUMNS = ['PAYS', 'VILLE', 'TYPE DE LIEU', 'Mode de vente']
+
+
+def _clean(value):
+    """Valeur de facette (None pour une valeur manquante ou vide)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+def facet_counts(df):
+    """Nombre de lieux par combinaison (PAYS, VILLE, TYPE DE LIEU, Mode de vente, HAS_COORDS)"""
+    has_coords = df['LATITUDE'].notna() & df['LONGITUDE'].notna()
+    return (
+        df[FACET_COLUMNS].assign(HAS_COORDS=has_coords)
+        .groupby(FACET_COLUMNS + ['HAS_COORDS'], dropna=False, observed=True)
+        .size()
+        .reset_index(name='N')
+    )
+
+
+class FacetIndex:
+    """
+    Facettes et statistiques des lieux
+    Les statistiques (lieux avec coordonnées, pays, villes) sont précalculées pour chaque filtre
+    (pays ou None, ville ou None), comme dans la sidebar
+    """
+
+    def __init__(self, counts=None):
+        self.total = 0
+        self.total_with_coords = 0
+        self.counts = {column: Counter() for column in FACET_COLUMNS}
+        self.values = {column: [] for column in FACET_COLUMNS}
+        self.city_counts = Counter()
+        self.cities_by_country = {}
+        self._stats = {}
+        if counts is not None:
+            columns = [counts[column] for column in FACET_COLUMNS + ['HAS_COORDS', 'N']]
+            for pays, ville, type_lieu, mode_vente, has_coords, n in zip(*columns):
+                self._add([pays, ville, type_lieu, mode_vente], bool(has_coords), int(n))
+
+    @classmethod
+    def from_dataframe(cls, df):
+        return cls(facet_counts(df))
+
+    def _add(self, values, has_coords, n):
+        values = [_clean(value) for value in values]
+        pays, ville = values[0], values[1]
+        self.total += n
+
+        for column, value in zip(FACET_COLUMNS, values):
+            if value is None:
+                continue
+            if value not in self.counts[column]:
+                bisect.insort(self.values[column], value)
+            self.counts[column][value] += n
+
+        if pays is not None and ville is not None:
+            if (pays, ville) not in self.city_counts:
+                bisect.insort(self.cities_by_country.setdefault(pays, []), ville)
+            self.city_counts[(pays, ville)] += n
+
+        if has_coords:
+            self.total_with_coords += n
+            keys = [(None, None)]
+            if pays is not None:
+                keys.append((pays, None))
+            if ville is not None:
+                keys.append((None, ville))
+            if pays is not None and ville is not None:
+                keys.append((pays, ville))
+            for key in keys:
+                entry = self._stats.setdefault(key, [0, set(), set()])
+                entry[0] += n
+                if pays is not None:
+                    entry[1].add(pays)
+                if ville is not None:
+                    entry[2].add(ville)
+
+    def add_row(self, row):
+        """Met à jour l'index avec un nouveau lieu (dict colonne -> valeur)"""
+        has_coords = _clean(row.get('LATITUDE')) is not None and _clean(row.get('LONGITUDE')) is not None
+        self._add([row.get(column) for column in FACET_COLUMNS], has_coords, 1)
+
+    def countries(self):
+        """Pays triés"""
+        return self.values['PAYS']
+
+    def cities(self, pays=None):
+        """Villes triées, toutes ou pour un pays"""
+        if pays is None:
+            return self.values['VILLE']
+        return self.cities_by_country.get(pays, [])
+
+    def distinct(self, column):
+        """Valeurs triées d'une colonne de facette"""
+        return self.values[column]
+
+    def stats(self, pays=None, ville=None):
+        """(lieux avec coordonnées, nombre de pays, nombre de villes) pour le filtre donné"""
+        entry = self._stats.get((pays, ville))
+        if entry is None:
+            return 0, 0, 0
+        return entry[0], len(entry[1]), len(entry[2])
@@ -5,35 +5,29 @@ Utilise l'API Nominatim (OpenStreetMap) pour le géocodage gratuit
 """
 
 import pandas as pd
-import time
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+import argparse
+import hashlib
+import json
+import os
 import sys
+from datetime import datetime
 
-def is_valid_value(value):
-    """
-    Vérifie si une valeur est valide (non NaN, non None, non vide)
-    """
-    if pd.isna(value):
-        return False
-    if value is None:
-        return False
-    if isinstance(value, str):
-        value_clean = value.strip().lower()
-        if not value_clean or value_clean in ['nan', 'null', 'none', '--', '']:
-            return False
-    return True
-
-def geocode_address(geolocator, pays, ville, lieu, adresse):
+from batch_geocoding import BatchGeocoder, NOMINATIM_RATE
+from geocoders import get_geocoder
+from geocoding import GeocodeCache
+from schema import SHOP_FILE
+from storage import update_shops
+from validation import is_valid_value
+
+# Journal de reprise : une ligne JSON par adresse traitée
+JOURNAL_FILE = 'data/geocode_journal.jsonl'
+
+def build_queries(pays, ville, lieu, adresse):
     """
-    Essaie de géocoder une adresse en utilisant plusieurs stratégies
+    Construit la liste des requêtes de géocodage à essayer, par ordre de priorité
     """
-    # Liste des requêtes à essayer, par ordre de priorité
     queries = []
     
-    # Construire les parties valides
-    parts = []
-    
     # Stratégie 1: Adresse complète
     if is_valid_value(adresse):
         parts = [adresse.strip()]
@@ -58,28 +52,88 @@ def geocode_address(geolocator, pays, ville, lieu, adresse):
     if is_valid_value(ville) and is_valid_value(pays):
         queries.append(f"{ville.strip()}, {pays.strip()}")
     
-    # Essayer chaque requête
-    for query in queries:
-        try:
-            print(f"  Tentative: {query[:80]}...")
-            location = geolocator.geocode(query, timeout=10)
-            
-            if location:
-                print(f"  ✓ Trouvé: {location.latitude}, {location.longitude}")
-                return location.latitude, location.longitude
-            else:
-                print(f"  ✗ Aucun résultat")
-                
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            print(f"  ⚠ Erreur: {e}")
-            time.sleep(2)
-            continue
-    
-    return None, None
-
-def main():
+    return queries
+
+class GeocodeJournal:
+    """
+    Journal des lignes déjà traitées (JSON lines, une entrée écrite et synchronisée par ligne)
+    Statuts : 'found' (coordonnées trouvées), 'failed' (introuvable), 'error' (erreur réseau, à réessayer)
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.entries = {}
+        if resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Dernière ligne tronquée par un arrêt brutal
+                        continue
+                    self.entries[entry['key']] = entry
+        # Sans reprise, l'ancien journal n'est remplacé qu'à la première ligne traitée
+        self._mode = 'a' if resume else 'w'
+        self._file = None
+
+    def record(self, key, status, lat=None, lon=None, query=None):
+        entry = {'key': key, 'status': status, 'lat': lat, 'lon': lon, 'query': query,
+                 'time': datetime.now().isoformat(timespec='seconds')}
+        self.entries[key] = entry
+        if self._file is None:
+            self._file = open(self.path, self._mode, encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def found(self):
+        """Clé de ligne -> (latitude, longitude) des lignes géocodées"""
+        return {key: (entry['lat'], entry['lon']) for key, entry in self.entries.items() if entry['status'] == 'found'}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def row_key(billet_id, pays, ville, lieu, adresse):
+    """Identifiant stable d'une ligne (indépendant de sa position dans le fichier)"""
+    parts = ['' if pd.isna(value) else str(value).strip().lower() for value in (billet_id, pays, ville, lieu, adresse)]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def row_keys(df):
+    return [row_key(*values) for values in df[['#', 'PAYS', 'VILLE', 'LIEU', 'ADRESSE']].itertuples(index=False)]
+
+
+def apply_found(found, backup_file=None):
+    """Retourne la fonction de mise à jour de shop.csv : coordonnées trouvées ajoutées aux seules lignes sans coordonnées"""
+    def update(df):
+        if backup_file:
+            df.to_csv(backup_file, index=False)
+        missing = df['LATITUDE'].isna() | df['LONGITUDE'].isna()
+        for idx, key in zip(df.index[missing], row_keys(df[missing])):
+            if key in found:
+                df.at[idx, 'LATITUDE'], df.at[idx, 'LONGITUDE'] = found[key]
+        return df
+    return update
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ajoute les coordonnées GPS manquantes de shop.csv")
+    parser.add_argument('-y', '--yes', action='store_true', help="Ne pas demander de confirmation (tâche planifiée)")
+    parser.add_argument('--limit', type=int, help="Nombre maximum de lignes à géocoder pendant cette exécution")
+    parser.add_argument('--resume', action='store_true', help="Reprendre depuis le journal (lignes déjà traitées ignorées)")
+    parser.add_argument('--retry-failed', action='store_true', help="Avec --resume : réessayer aussi les adresses introuvables")
+    parser.add_argument('--journal', default=JOURNAL_FILE, help=f"Journal de reprise (défaut : {JOURNAL_FILE})")
+    parser.add_argument('--csv', default=SHOP_FILE, help=f"Fichier des lieux (défaut : {SHOP_FILE})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     # Fichier CSV
-    csv_file = 'data/shop.csv'
+    csv_file = args.csv
     
     print("=" * 80)
     print("GÉOCODAGE DES ADRESSES MANQUANTES")
@@ -102,70 +156,106 @@ def main():
         print("\n✓ Toutes les lignes ont déjà des coordonnées!")
         return
     
-    # Demander confirmation
-    print(f"\n⚠ Ce script va essayer de géocoder {len(rows_to_geocode)} adresses.")
-    print("   Note: L'API Nominatim a une limite de 1 requête/seconde.")
-    print(f"   Temps estimé: ~{len(rows_to_geocode)} secondes")
+    # Reprise : ignorer les lignes déjà traitées lors d'une exécution précédente
+    journal = GeocodeJournal(args.journal, resume=args.resume)
+    done_statuses = {'found'} if args.retry_failed else {'found', 'failed'}
+    keys = row_keys(rows_to_geocode)
+    pending = [
+        (idx, key) for idx, key in zip(rows_to_geocode.index, keys)
+        if journal.entries.get(key, {}).get('status') not in done_statuses
+    ]
+    if args.resume:
+        print(f"   - Déjà traitées (journal {args.journal}): {len(rows_to_geocode) - len(pending)}")
+    if args.limit is not None:
+        pending = pending[:args.limit]
     
-    response = input("\n▶ Continuer? (o/n): ")
-    if response.lower() not in ['o', 'oui', 'y', 'yes']:
-        print("Annulé.")
-        return
+    if pending:
+        # Demander confirmation
+        print(f"\n⚠ Ce script va essayer de géocoder {len(pending)} adresses.")
+        print("   Note: L'API Nominatim a une limite de 1 requête/seconde.")
+        print(f"   Temps estimé: ~{len(pending)} secondes")
+        
+        if not args.yes:
+            try:
+                response = input("\n▶ Continuer? (o/n): ")
+            except EOFError:
+                response = ''
+                print("\n(pas de terminal : utilisez --yes pour une exécution non interactive)")
+            if response.lower() not in ['o', 'oui', 'y', 'yes']:
+                print("Annulé.")
+                journal.close()
+                return
     
     # Initialiser le géocodeur
-    print("\n🌍 Initialisation du géocodeur Nominatim...")
-    geolocator = Nominatim(user_agent="euro-souvenir-app/1.0")
-    
-    # Géocoder chaque ligne
-    geocoded_count = 0
-    failed_count = 0
+    backend = os.environ.get('GEOCODER_BACKEND', 'nominatim')
+    print(f"\n🌍 Initialisation du géocodeur ({backend})...")
+    geolocator = get_geocoder(backend)
+    cache = GeocodeCache()
     
+    # Géocoder toutes les lignes par lots (requêtes dédoublonnées, débit limité à 1 req/s)
+    # Chaque ligne terminée est inscrite au journal : un arrêt (Ctrl-C, plantage) ne perd rien
     print("\n🔄 Démarrage du géocodage...\n")
     
-    for idx, row in rows_to_geocode.iterrows():
-        print(f"[{idx + 1}/{len(df)}] {row['TITRE']}")
-        
-        lat, lon = geocode_address(
-            geolocator,
-            row['PAYS'],
-            row['VILLE'],
-            row['LIEU'],
-            row['ADRESSE']
-        )
-        
-        if lat and lon:
-            df.at[idx, 'LATITUDE'] = lat
-            df.at[idx, 'LONGITUDE'] = lon
-            geocoded_count += 1
+    query_lists = [
+        build_queries(df.at[idx, 'PAYS'], df.at[idx, 'VILLE'], df.at[idx, 'LIEU'], df.at[idx, 'ADRESSE'])
+        for idx, _ in pending
+    ]
+    batch = BatchGeocoder(geolocator, rate=NOMINATIM_RATE, cache=cache)
+    
+    def report(position, result):
+        idx, key = pending[position]
+        lat, lon, query = result
+        print(f"[{idx + 1}/{len(df)}] {df.at[idx, 'TITRE']}")
+        if query:
+            print(f"  ✓ Trouvé ({query[:80]}): {lat}, {lon}")
+            journal.record(key, 'found', lat, lon, query)
+        elif any(q in batch.errored_queries for q in query_lists[position]):
+            print(f"  ⚠ Erreur du service, ligne à réessayer")
+            journal.record(key, 'error')
         else:
             print(f"  ✗ Échec du géocodage")
-            failed_count += 1
-        
-        # Respecter la limite de l'API (1 req/sec)
-        time.sleep(1.1)
-        print()
+            journal.record(key, 'failed')
+    
+    try:
+        batch.geocode_all(query_lists, progress=report)
+    except KeyboardInterrupt:
+        print("\n⏸ Interrompu : les lignes déjà traitées sont dans le journal.")
+    finally:
+        journal.close()
+    
+    print(f"\n🌐 Requêtes envoyées à l'API: {batch.requests} (cache: {cache.hits}, erreurs: {batch.errors})\n")
+    
+    # Résultats de cette exécution et des précédentes (journal), appliqués aux lignes encore sans coordonnées
+    found = journal.found()
+    statuses = [journal.entries.get(key, {}).get('status') for _, key in pending]
+    remaining = [key for key in keys if journal.entries.get(key, {}).get('status') not in done_statuses]
+    geocoded_count = sum(1 for key in keys if key in found)
     
     # Résumé
     print("=" * 80)
     print("RÉSUMÉ")
     print("=" * 80)
     print(f"✓ Géocodées avec succès: {geocoded_count}")
-    print(f"✗ Échecs: {failed_count}")
+    print(f"✗ Échecs: {statuses.count('failed')}")
+    if statuses.count('error'):
+        print(f"⚠ Erreurs à réessayer: {statuses.count('error')}")
     
     if geocoded_count > 0:
-        # Sauvegarder le CSV mis à jour
+        # Sauvegarder le CSV mis à jour (relu sous verrou : les lieux ajoutés entre-temps sont conservés)
         backup_file = csv_file.replace('.csv', '_backup.csv')
         print(f"\n💾 Sauvegarde de l'original vers: {backup_file}")
-        df.to_csv(backup_file, index=False)
-        
         print(f"💾 Mise à jour du fichier: {csv_file}")
-        df.to_csv(csv_file, index=False)
+        update_shops(apply_found(found, backup_file), csv_file)
         
         print("\n✓ Terminé! Le fichier CSV a été mis à jour.")
     else:
         print("\n⚠ Aucune modification n'a été apportée au CSV.")
     
+    if remaining:
+        print(f"\n▶ Pour continuer : python geocode_missing.py --resume --yes")
+    
     # Afficher les lignes qui n'ont toujours pas de coordonnées
+    df = pd.read_csv(csv_file)
     still_missing = df['LATITUDE'].isna() | df['LONGITUDE'].isna()
     if still_missing.sum() > 0:
         print(f"\n⚠ {still_missing.sum()} lignes n'ont toujours pas de coordonnées:")
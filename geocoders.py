@@ -0,0 +1,191 @@
+"""
+Backends de géocodage interchangeables
+Tout backend expose geocode(query, timeout=...) et retourne un objet avec latitude/longitude (ou None),
+comme les géocodeurs geopy
+- 'nominatim' : API Nominatim (OpenStreetMap), en ligne et limitée à 1 requête/seconde
+- 'offline'   : index local construit depuis un gazetteer (fichier TSV type GeoNames) et les lieux connus de shop.csv
+- 'hybrid'    : index local d'abord, Nominatim seulement si le lieu est inconnu localement
+Le backend par défaut est choisi par la variable d'environnement GEOCODER_BACKEND
+"""
+
+import csv
+import os
+import re
+import unicodedata
+
+import pandas as pd
+from geopy.geocoders import Nominatim
+
+from geocoding import CachedLocation, geocoder_name
+from schema import REFERENCE_FILE, SHOP_FILE
+
+USER_AGENT = "euro-souvenir-app/1.0"
+GAZETTEER_FILE = 'data/gazetteer.tsv'
+BACKENDS = ['nominatim', 'offline', 'hybrid']
+
+# Colonnes du format GeoNames (allCountries.txt, cities15000.txt, ...)
+GEONAMES_NAME = 1
+GEONAMES_ASCIINAME = 2
+GEONAMES_ALTERNATENAMES = 3
+GEONAMES_LATITUDE = 4
+GEONAMES_LONGITUDE = 5
+GEONAMES_COUNTRY_CODE = 8
+GEONAMES_POPULATION = 14
+
+
+def normalize_name(name):
+    """Normalise un nom de lieu : sans accents, minuscules, ponctuation remplacée par des espaces"""
+    if name is None or pd.isna(name):
+        return ''
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', name).strip()
+
+
+def country_codes_from_reference(df_ref):
+    """
+    Correspondance nom de pays (français, normalisé) -> code ISO, déduite de master_data.csv
+    (les POSTAL_CODE commencent par le code ISO du pays, ex: FR-75)
+    """
+    df_ref = df_ref.dropna(subset=['COUNTRY', 'POSTAL_CODE'])
+    codes = df_ref['POSTAL_CODE'].str[:2].str.upper()
+    names = df_ref['COUNTRY'].map(normalize_name)
+    pairs = pd.DataFrame({'name': names, 'code': codes})
+    return pairs.groupby('name')['code'].agg(lambda c: c.value_counts().index[0]).to_dict()
+
+
+class GazetteerGeocoder:
+    """
+    Géocodeur hors ligne : index par (nom normalisé, pays) -> (latitude, longitude, population)
+    Seule la première partie de la requête (lieu ou ville) est cherchée, le pays étant la dernière partie :
+    les stratégies de build_queries gardent ainsi leur ordre de priorité
+    """
+
+    is_local = True
+    cache_name = 'offline'
+
+    def __init__(self, country_codes=None):
+        self.country_codes = country_codes or {}
+        self.places = {}
+
+    def __len__(self):
+        return len(self.places)
+
+    def _country_key(self, country):
+        """Code ISO du pays si connu, sinon nom normalisé"""
+        name = normalize_name(country)
+        if len(name) == 2:
+            return name.upper()
+        return self.country_codes.get(name, name)
+
+    def _put(self, key, latitude, longitude, population):
+        current = self.places.get(key)
+        if current is None or population > current[2]:
+            self.places[key] = (latitude, longitude, population)
+
+    def add(self, name, country, latitude, longitude, population=0):
+        """Ajoute un lieu à l'index (en cas d'homonymes, le plus peuplé l'emporte)"""
+        name = normalize_name(name)
+        if not name:
+            return
+        latitude, longitude = float(latitude), float(longitude)
+        self._put((name, self._country_key(country)), latitude, longitude, population)
+        self._put((name, ''), latitude, longitude, population)
+
+    def load_gazetteer(self, path):
+        """
+        Charge un fichier TSV : format GeoNames complet, ou simplifié 'nom<TAB>pays<TAB>latitude<TAB>longitude'
+        """
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                try:
+                    if len(row) > GEONAMES_POPULATION:
+                        latitude = float(row[GEONAMES_LATITUDE])
+                        longitude = float(row[GEONAMES_LONGITUDE])
+                        population = int(row[GEONAMES_POPULATION] or 0)
+                        country = row[GEONAMES_COUNTRY_CODE]
+                        names = {row[GEONAMES_NAME], row[GEONAMES_ASCIINAME]}
+                        names.update(row[GEONAMES_ALTERNATENAMES].split(','))
+                    elif len(row) >= 4:
+                        latitude, longitude, population = float(row[2]), float(row[3]), 0
+                        country = row[1]
+                        names = {row[0]}
+                    else:
+                        continue
+                except ValueError:
+                    continue
+                for name in names:
+                    self.add(name, country, latitude, longitude, population)
+
+    def add_shops(self, df):
+        """Ajoute les lieux (LIEU) et villes (centre des lieux connus) de shop.csv ayant des coordonnées"""
+        df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+        for (lieu, pays), coords in df.dropna(subset=['LIEU']).groupby(['LIEU', 'PAYS'], observed=True)[['LATITUDE', 'LONGITUDE']].first().iterrows():
+            self.add(lieu, pays, coords['LATITUDE'], coords['LONGITUDE'])
+        for (ville, pays), coords in df.dropna(subset=['VILLE']).groupby(['VILLE', 'PAYS'], observed=True)[['LATITUDE', 'LONGITUDE']].mean().iterrows():
+            self.add(ville, pays, coords['LATITUDE'], coords['LONGITUDE'])
+
+    def geocode(self, query, timeout=None, **kwargs):
+        """Résout 'nom, ..., pays' depuis l'index local ; None si le nom est inconnu"""
+        parts = [part for part in str(query).split(',') if normalize_name(part)]
+        if not parts:
+            return None
+        name = normalize_name(parts[0])
+        place = None
+        if len(parts) >= 2:
+            country = self._country_key(parts[-1])
+            place = self.places.get((name, country))
+            # Pays non reconnu (ni code ISO, ni nom connu) : recherche sans contrainte de pays
+            if place is None and len(country) != 2:
+                place = self.places.get((name, ''))
+        else:
+            place = self.places.get((name, ''))
+        if place is None:
+            return None
+        return CachedLocation(place[0], place[1])
+
+
+class FallbackGeocoder:
+    """Essaie plusieurs backends dans l'ordre et retourne le premier résultat trouvé"""
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    @property
+    def cache_name(self):
+        return '+'.join(geocoder_name(backend) for backend in self.backends)
+
+    def geocode(self, query, **kwargs):
+        for backend in self.backends:
+            location = backend.geocode(query, **kwargs)
+            if location:
+                return location
+        return None
+
+
+def load_offline_geocoder(gazetteer_file=GAZETTEER_FILE, shops_file=SHOP_FILE,
+                          reference_file=REFERENCE_FILE):
+    """Construit le géocodeur hors ligne à partir des fichiers disponibles"""
+    country_codes = {}
+    if os.path.exists(reference_file):
+        country_codes = country_codes_from_reference(
+            pd.read_csv(reference_file, usecols=['COUNTRY', 'POSTAL_CODE'])
+        )
+    geocoder = GazetteerGeocoder(country_codes)
+    if gazetteer_file and os.path.exists(gazetteer_file):
+        geocoder.load_gazetteer(gazetteer_file)
+    if shops_file and os.path.exists(shops_file):
+        geocoder.add_shops(pd.read_csv(shops_file))
+    return geocoder
+
+
+def get_geocoder(backend=None):
+    """Retourne le géocodeur demandé (par défaut : variable d'environnement GEOCODER_BACKEND, sinon Nominatim)"""
+    backend = backend or os.environ.get('GEOCODER_BACKEND', 'nominatim')
+    if backend == 'nominatim':
+        return Nominatim(user_agent=USER_AGENT)
+    if backend == 'offline':
+        return load_offline_geocoder()
+    if backend == 'hybrid':
+        return FallbackGeocoder([load_offline_geocoder(), Nominatim(user_agent=USER_AGENT)])
+    raise ValueError(f"Géocodeur inconnu : {backend} (valeurs possibles : {', '.join(BACKENDS)})")
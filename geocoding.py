@@ -0,0 +1,139 @@
+"""
+Cache persistant (SQLite) des résultats de géocodage
+Partagé par l'application Streamlit et le script geocode_missing.py
+Les résultats positifs et négatifs sont conservés, avec une durée de validité (TTL)
+Les résultats sont rangés par backend : un échec ou un centre de ville approximatif de l'index hors ligne
+n'est jamais servi à la place d'une réponse de Nominatim
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+CACHE_FILE = 'data/geocode_cache.sqlite'
+
+# Durées de validité : un résultat trouvé change rarement, un échec peut être corrigé côté OpenStreetMap
+HIT_TTL = 180 * 24 * 3600
+MISS_TTL = 7 * 24 * 3600
+
+# Résultat minimal renvoyé depuis le cache (mêmes attributs que geopy.Location)
+CachedLocation = namedtuple('CachedLocation', ['latitude', 'longitude'])
+
+
+def geocoder_name(geolocator):
+    """Nom du backend dans la clé du cache (ex: 'nominatim', 'offline', 'offline+nominatim')"""
+    return getattr(geolocator, 'cache_name', None) or type(geolocator).__name__.lower()
+
+
+def normalize_query(query):
+    """Normalise une requête de géocodage (unicode, casse, espaces) pour servir de clé de cache"""
+    query = unicodedata.normalize('NFKC', str(query)).lower()
+    query = re.sub(r'\s+', ' ', query)
+    query = re.sub(r'\s*,\s*', ', ', query)
+    return query.strip(' ,')
+
+
+class GeocodeCache:
+    """
+    Cache de géocodage sur disque (SQLite) avec une copie en mémoire pour les accès répétés
+    Utilisable avec n'importe quel géocodeur exposant geocode(query, timeout=...) (geopy ou bouchon de test)
+    """
+
+    def __init__(self, path=CACHE_FILE, hit_ttl=HIT_TTL, miss_ttl=MISS_TTL):
+        self.path = path
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode_result ("
+            " backend TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " latitude REAL,"
+            " longitude REAL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (backend, query))"
+        )
+        self._conn.commit()
+
+    def _is_fresh(self, latitude, created_at):
+        ttl = self.hit_ttl if latitude is not None else self.miss_ttl
+        return time.time() - created_at < ttl
+
+    def get(self, query, backend='nominatim'):
+        """
+        Cherche une requête dans le cache du backend
+        Retourne (trouvé, location) : location vaut None pour un échec mémorisé
+        """
+        key = (backend, normalize_query(query))
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = self._conn.execute(
+                    "SELECT latitude, longitude, created_at FROM geocode_result WHERE backend = ? AND query = ?", key
+                ).fetchone()
+                if entry is not None:
+                    self._memory[key] = entry
+
+        if entry is None or not self._is_fresh(entry[0], entry[2]):
+            return False, None
+        if entry[0] is None:
+            return True, None
+        return True, CachedLocation(entry[0], entry[1])
+
+    def set(self, query, location, backend='nominatim'):
+        """Mémorise le résultat d'une requête pour le backend (location None = aucun résultat)"""
+        key = (backend, normalize_query(query))
+        latitude = location.latitude if location is not None else None
+        longitude = location.longitude if location is not None else None
+        entry = (latitude, longitude, time.time())
+        with self._lock:
+            self._memory[key] = entry
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_result (backend, query, latitude, longitude, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (*key, *entry)
+            )
+            self._conn.commit()
+
+    def geocode(self, geolocator, query, timeout=10):
+        """
+        Géocode une requête en passant par le cache
+        Les erreurs du géocodeur (timeout, service) ne sont pas mémorisées et sont propagées
+        """
+        backend = geocoder_name(geolocator)
+        found, location = self.get(query, backend)
+        if found:
+            self.hits += 1
+            return location
+
+        self.misses += 1
+        location = geolocator.geocode(query, timeout=timeout)
+        self.set(query, location, backend)
+        return location
+
+    def hit_ratio(self):
+        """Proportion de requêtes servies par le cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def purge_expired(self):
+        """Supprime les entrées expirées du fichier de cache"""
+        now = time.time()
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute(
+                "DELETE FROM geocode_result WHERE (latitude IS NOT NULL AND created_at < ?)"
+                " OR (latitude IS NULL AND created_at < ?)",
+                (now - self.hit_ttl, now - self.miss_ttl)
+            )
+            self._conn.commit()
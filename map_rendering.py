@@ -0,0 +1,248 @@
+"""
+Construction des marqueurs de la carte
+Les popups, infobulles et couleurs sont calculés colonne par colonne (opérations vectorisées pandas)
+une seule fois par version des données ; un changement de filtre ne fait que découper le résultat
+Au-delà de CLUSTER_THRESHOLD points, les lieux sont envoyés en un seul tableau compact
+et les popups sont construits côté navigateur (couche FastMarkerCluster)
+Les cartes construites sont gardées dans un cache LRU (MapCache) indexé par les filtres et la version des données
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+import folium
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+from schema import text
+
+# Couleur du marqueur selon le type de lieu (première règle qui correspond)
+TYPE_COLORS = [
+    ('Monument', 'red'),
+    ('Musée', 'green'),
+    ('Office', 'orange'),
+    ('Boutique', 'purple'),
+]
+DEFAULT_COLOR = 'blue'
+
+# Nombre de points au-delà duquel la carte passe en mode regroupé (rendu côté navigateur)
+CLUSTER_THRESHOLD = 300
+
+# Nombre de cartes gardées en cache (une par combinaison pays/ville récemment affichée)
+MAP_CACHE_SIZE = 32
+
+# Colonnes envoyées au navigateur pour le mode regroupé (après LATITUDE, LONGITUDE et la couleur)
+CLUSTER_COLUMNS = [
+    'TITRE', 'LIEU', 'VILLE', 'ADRESSE', 'TYPE DE LIEU', 'Mode de vente',
+    'MILESIME', 'PRIX INDICATIF (€)', 'COMMENTAIRE', 'IMAGE',
+]
+
+POPUP_HEADER = '<div style="width: 350px; font-family: Arial, sans-serif;"><h4 style="margin-bottom: 10px; color: #1f77b4;">'
+POPUP_IMAGE = '<img src="{}" style="width: 100%; max-height: 200px; object-fit: cover; border-radius: 5px; margin-bottom: 10px;">'
+
+
+def type_color(type_lieu):
+    """Retourne la couleur du marqueur pour un type de lieu"""
+    if pd.isna(type_lieu) or not type_lieu:
+        return DEFAULT_COLOR
+    for keyword, color in TYPE_COLORS:
+        if keyword in str(type_lieu):
+            return color
+    return DEFAULT_COLOR
+
+
+def type_colors(types):
+    """Couleurs d'une colonne de types de lieu (règle évaluée une fois par valeur distincte)"""
+    types = text(types)
+    color_map = {type_lieu: type_color(type_lieu) for type_lieu in types.unique()}
+    return types.map(color_map).astype(object)
+
+
+def _text(df, column):
+    """Colonne convertie en texte (valeurs manquantes remplacées par une chaîne vide)"""
+    return text(df[column])
+
+
+def _coordinate(df, column):
+    """Coordonnée en float64 arrondie au micro-degré (évite les artefacts float32 dans le HTML envoyé)"""
+    return df[column].astype('float64').round(6)
+
+
+def _optional_line(df, column, label):
+    """Ligne HTML '<b>label</b> valeur<br>' uniquement pour les lignes où la valeur est renseignée"""
+    values = df[column]
+    return ('<b>' + label + '</b> ' + _text(df, column) + '<br>').where(values.notna(), '')
+
+
+def build_marker_specs(df):
+    """
+    Calcule pour chaque lieu avec coordonnées : position, popup HTML, infobulle et couleur
+    Retourne un DataFrame indexé comme df (à découper avec .loc selon les filtres)
+    """
+    df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+
+    colors = type_colors(df['TYPE DE LIEU'])
+    image = _text(df, 'IMAGE').str.strip()
+    image_html = image.map(POPUP_IMAGE.format).where(image != '', '')
+
+    popup_html = (
+        POPUP_HEADER + _text(df, 'TITRE') + '</h4>'
+        + image_html
+        + '<div style="line-height: 1.6;">'
+        + '<b>🏢 Lieu:</b> ' + _text(df, 'LIEU') + '<br>'
+        + '<b>🏙️ Ville:</b> ' + _text(df, 'VILLE') + '<br>'
+        + '<b>📍 Adresse:</b> ' + _text(df, 'ADRESSE') + '<br>'
+        + '<b>🏛️ Type:</b> ' + _text(df, 'TYPE DE LIEU') + '<br>'
+        + '<b>💳 Mode de vente:</b> ' + _text(df, 'Mode de vente') + '<br>'
+        + '<b>📅 Millésime:</b> ' + _text(df, 'MILESIME') + '<br>'
+        + _optional_line(df, 'PRIX INDICATIF (€)', '💰 Prix indicatif:')
+        + _optional_line(df, 'COMMENTAIRE', 'ℹ️ Commentaire:')
+        + '</div></div>'
+    )
+
+    return pd.DataFrame({
+        'PAYS': df['PAYS'],
+        'VILLE': df['VILLE'],
+        'LATITUDE': _coordinate(df, 'LATITUDE'),
+        'LONGITUDE': _coordinate(df, 'LONGITUDE'),
+        'popup_html': popup_html,
+        'tooltip': _text(df, 'TITRE'),
+        'color': colors,
+    }, index=df.index)
+
+
+def add_markers(m, specs):
+    """Ajoute à la carte un marqueur par ligne de specs (popups déjà construits)"""
+    for lat, lon, popup_html, tooltip, color in zip(
+        specs['LATITUDE'], specs['LONGITUDE'], specs['popup_html'], specs['tooltip'], specs['color']
+    ):
+        folium.Marker(
+            location=[lat, lon],
+            popup=folium.Popup(popup_html, max_width=370),
+            tooltip=tooltip,
+            icon=folium.Icon(color=color, icon='info-sign')
+        ).add_to(m)
+
+
+# Fonction JavaScript appelée pour chaque ligne : [lat, lon, couleur, TITRE, LIEU, VILLE, ADRESSE,
+# TYPE DE LIEU, Mode de vente, MILESIME, PRIX, COMMENTAIRE, IMAGE]
+CLUSTER_CALLBACK = """
+function (row) {
+    var html = %(header)s + row[3] + '</h4>';
+    if (row[12]) {
+        html += %(image)s.replace('{}', row[12]);
+    }
+    html += '<div style="line-height: 1.6;">'
+        + '<b>🏢 Lieu:</b> ' + row[4] + '<br>'
+        + '<b>🏙️ Ville:</b> ' + row[5] + '<br>'
+        + '<b>📍 Adresse:</b> ' + row[6] + '<br>'
+        + '<b>🏛️ Type:</b> ' + row[7] + '<br>'
+        + '<b>💳 Mode de vente:</b> ' + row[8] + '<br>'
+        + '<b>📅 Millésime:</b> ' + row[9] + '<br>';
+    if (row[10]) {
+        html += '<b>💰 Prix indicatif:</b> ' + row[10] + '<br>';
+    }
+    if (row[11]) {
+        html += '<b>ℹ️ Commentaire:</b> ' + row[11] + '<br>';
+    }
+    html += '</div></div>';
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.setIcon(L.AwesomeMarkers.icon({icon: 'info-sign', prefix: 'glyphicon', markerColor: row[2]}));
+    marker.bindPopup(html, {maxWidth: 370});
+    marker.bindTooltip(row[3]);
+    return marker;
+}
+""" % {'header': json.dumps(POPUP_HEADER), 'image': json.dumps(POPUP_IMAGE)}
+
+
+def build_cluster_rows(df):
+    """
+    Lignes compactes [lat, lon, couleur, champs...] pour le mode regroupé
+    Les popups ne sont pas construits ici mais dans le navigateur (CLUSTER_CALLBACK)
+    """
+    df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    rows = pd.DataFrame({
+        'LATITUDE': _coordinate(df, 'LATITUDE'),
+        'LONGITUDE': _coordinate(df, 'LONGITUDE'),
+        'color': type_colors(df['TYPE DE LIEU']),
+    }, index=df.index)
+    for column in CLUSTER_COLUMNS:
+        rows[column] = _text(df, column).str.strip()
+    return rows.to_numpy().tolist()
+
+
+def add_marker_cluster(m, df):
+    """Ajoute tous les lieux en une seule couche regroupée, rendue côté navigateur"""
+    FastMarkerCluster(build_cluster_rows(df), callback=CLUSTER_CALLBACK, name='Lieux').add_to(m)
+
+
+def add_locations(m, df, specs, threshold=CLUSTER_THRESHOLD):
+    """
+    Ajoute les lieux de df à la carte
+    Marqueurs individuels (specs pré-calculés) jusqu'à threshold points, couche regroupée au-delà
+    """
+    if len(df) > threshold:
+        add_marker_cluster(m, df)
+    else:
+        add_markers(m, specs.loc[df.index])
+
+
+def build_map(df, specs, zoom_start=6, with_markers=True):
+    """
+    Construit la carte Folium centrée sur les lieux de df, avec leurs marqueurs
+    (sans marqueurs si with_markers=False : ils sont alors envoyés à part, voir build_feature_group)
+    Le rendu HTML est fait ici, une fois, pour pouvoir réutiliser la carte sans la re-rendre
+    """
+    m = folium.Map(
+        location=[df['LATITUDE'].mean(), df['LONGITUDE'].mean()],
+        zoom_start=zoom_start,
+        tiles='OpenStreetMap'
+    )
+    if with_markers:
+        add_locations(m, df, specs)
+    m.get_root().render()
+    return m
+
+
+def build_feature_group(df, specs):
+    """Couche contenant les marqueurs de df, à superposer à une carte déjà affichée (st_folium feature_group_to_add)"""
+    feature_group = folium.FeatureGroup(name='Lieux')
+    add_locations(feature_group, df, specs)
+    return feature_group
+
+
+class MapCache:
+    """
+    Cache LRU des cartes déjà construites, partagé entre les sessions
+    La clé contient les filtres et la version des données : une carte n'est jamais servie périmée
+    """
+
+    def __init__(self, max_entries=MAP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._maps)
+
+    def get_or_build(self, key, build):
+        """Retourne la carte associée à key, en la construisant avec build() si besoin"""
+        with self._lock:
+            if key in self._maps:
+                self._maps.move_to_end(key)
+                return self._maps[key]
+
+        m = build()
+
+        with self._lock:
+            self._maps[key] = m
+            self._maps.move_to_end(key)
+            while len(self._maps) > self.max_entries:
+                self._maps.popitem(last=False)
+        return m
+
+    def clear(self):
+        """Vide le cache (appelé après une modification des données)"""
+        with self._lock:
+            self._maps.clear()
@@ -0,0 +1,170 @@
+"""
+Mesures de performance légères : chronomètres et compteurs par exécution du script Streamlit
+- un Profiler par exécution (rerun), rattaché au thread courant (une session = un thread)
+- @profiled(nom) et profiler.timer(nom) ne coûtent presque rien quand aucune mesure n'est en cours
+- PerfLog garde les dernières exécutions (partagé entre sessions) et les exporte en JSON lines
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Fichier JSON lines où ajouter chaque exécution (désactivé si vide), ex: PERF_LOG=data/perf.jsonl
+PERF_LOG = os.environ.get('PERF_LOG', '')
+PERF_HISTORY = 200
+
+_current = threading.local()
+
+
+class Profiler:
+    """Durées cumulées (secondes, nombre d'appels), compteurs et valeurs d'une exécution"""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.counters = {}
+        self.gauges = {}
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        total, calls = self.timings.get(name, (0.0, 0))
+        self.timings[name] = (total + seconds, calls + 1)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def record(self):
+        """Résumé sérialisable de l'exécution (durées en millisecondes)"""
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'label': self.label,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'timings': {
+                name: {'ms': round(total * 1000, 2), 'calls': calls}
+                for name, (total, calls) in self.timings.items()
+            },
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+
+
+def start_run(label=''):
+    """Démarre la mesure d'une exécution dans le thread courant"""
+    _current.profiler = Profiler(label)
+    return _current.profiler
+
+
+def finish_run():
+    """Termine la mesure en cours et retourne son résumé (None si aucune mesure)"""
+    profiler = getattr(_current, 'profiler', None)
+    _current.profiler = None
+    return profiler.record() if profiler is not None else None
+
+
+def current():
+    return getattr(_current, 'profiler', None)
+
+
+@contextmanager
+def timer(name):
+    """Chronomètre une section dans la mesure en cours (sans effet s'il n'y en a pas)"""
+    profiler = current()
+    if profiler is None:
+        yield
+        return
+    with profiler.timer(name):
+        yield
+
+
+def add_time(name, seconds):
+    """Ajoute une durée mesurée ailleurs (ex: dans un thread d'arrière-plan) à la mesure en cours"""
+    profiler = current()
+    if profiler is not None:
+        profiler.add_time(name, seconds)
+
+
+def count(name, n=1):
+    profiler = current()
+    if profiler is not None:
+        profiler.count(name, n)
+
+
+def gauge(name, value):
+    """Enregistre une valeur (ex: ratio de succès d'un cache) dans la mesure en cours"""
+    profiler = current()
+    if profiler is not None:
+        profiler.gauge(name, value)
+
+
+def profiled(name=None):
+    """Décorateur : chronomètre chaque appel de la fonction dans la mesure en cours"""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = current()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.timer(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PerfLog:
+    """Historique borné des exécutions, éventuellement recopié dans un fichier JSON lines"""
+
+    def __init__(self, maxlen=PERF_HISTORY, path=PERF_LOG):
+        self.records = deque(maxlen=maxlen)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        if record is None:
+            return
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def to_jsonl(self):
+        with self._lock:
+            return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self.records)
+
+    def summary(self):
+        """Par section : nombre d'exécutions, durée moyenne et 95e centile (ms), de la plus coûteuse à la moins coûteuse"""
+        with self._lock:
+            records = list(self.records)
+        samples = {}
+        for record in records:
+            samples.setdefault('total', []).append(record['total_ms'])
+            for name, timing in record['timings'].items():
+                samples.setdefault(name, []).append(timing['ms'])
+        rows = []
+        for name, values in samples.items():
+            values = sorted(values)
+            rows.append({
+                'section': name,
+                'runs': len(values),
+                'mean_ms': round(sum(values) / len(values), 2),
+                'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))],
+            })
+        return sorted(rows, key=lambda row: row['mean_ms'], reverse=True)
@@ -0,0 +1,116 @@
+"""
+Index en mémoire des billets de référence (master_data.csv)
+Permet des recherches exactes en O(1) et des recherches par préfixe / approximatives
+pour l'autocomplétion du CODE
+"""
+
+import bisect
+import difflib
+
+import pandas as pd
+
+
+def normalize_code(code):
+    """Normalise un CODE de billet (espaces supprimés, majuscules)"""
+    if code is None or pd.isna(code):
+        return ''
+    return str(code).strip().upper()
+
+
+def normalize_year(year):
+    """Normalise un MILLÉSIME (année-numéro)"""
+    if year is None or pd.isna(year):
+        return ''
+    return str(year).strip()
+
+# Colonnes de master_data.csv utilisées par l'index et le formulaire d'ajout
+REFERENCE_INDEX_COLUMNS = ['#', 'CODE', 'YEAR', 'TITLE', 'CITY', 'COUNTRY', 'INFO_LINK']
+
+
+class ReferenceIndex:
+    """
+    Index des billets de référence construit une seule fois à partir du DataFrame
+    - par identifiant '#' (ex: UEBU_2025-6)
+    - par couple (CODE, YEAR)
+    - liste triée des CODE pour les recherches par préfixe
+    En cas de doublon, la première ligne rencontrée est conservée
+    """
+
+    def __init__(self, df_ref):
+        self.records = df_ref.to_dict('records')
+        self.by_id = {}
+        self.by_code_year = {}
+        self.by_code = {}
+
+        for record in self.records:
+            billet_id = record.get('#')
+            if isinstance(billet_id, str) and billet_id.strip():
+                self.by_id.setdefault(billet_id.strip().upper(), record)
+
+            code = normalize_code(record.get('CODE'))
+            year = normalize_year(record.get('YEAR'))
+            if code:
+                self.by_code_year.setdefault((code, year), record)
+                self.by_code.setdefault(code, []).append(record)
+
+        # Liste triée des codes pour la recherche par préfixe (bisect)
+        self.codes = sorted(self.by_code)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, billet_id):
+        """Retourne le billet correspondant à l'identifiant '#', ou None"""
+        if not isinstance(billet_id, str):
+            return None
+        return self.by_id.get(billet_id.strip().upper())
+
+    def lookup(self, code, year):
+        """Retourne le billet correspondant au CODE et au MILLÉSIME, ou None"""
+        code = normalize_code(code)
+        year = normalize_year(year)
+        if not code or not year:
+            return None
+        record = self.get(f"{code}_{year}")
+        if record is None:
+            record = self.by_code_year.get((code, year))
+        return record
+
+    def codes_with_prefix(self, prefix, limit=10):
+        """Retourne les CODE commençant par le préfixe donné (ordre alphabétique)"""
+        prefix = normalize_code(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.codes, prefix)
+        matches = []
+        for code in self.codes[start:]:
+            if not code.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(code)
+        return matches
+
+    def similar_codes(self, code, limit=5, cutoff=0.6):
+        """Retourne les CODE proches (fautes de frappe) du code donné"""
+        code = normalize_code(code)
+        if not code:
+            return []
+        return difflib.get_close_matches(code, self.codes, n=limit, cutoff=cutoff)
+
+    def suggest(self, code, year=None, limit=10):
+        """
+        Suggestions pour l'autocomplétion, un billet par CODE : CODE commençant par le préfixe,
+        puis, à défaut, CODE proches ; pour chaque CODE, le billet du MILLÉSIME saisi (ou de la même année)
+        s'il existe, sinon le premier
+        """
+        codes = self.codes_with_prefix(code, limit=limit)
+        if not codes:
+            codes = self.similar_codes(code, limit=limit)
+        year = normalize_year(year)
+        suggestions = []
+        for matched_code in codes:
+            records = self.by_code[matched_code]
+            record = self.by_code_year.get((matched_code, year))
+            if record is None and year:
+                record = next((r for r in records if normalize_year(r.get('YEAR'))[:4] == year[:4]), None)
+            suggestions.append(record if record is not None else records[0])
+        return suggestions
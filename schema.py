@@ -0,0 +1,70 @@
+"""
+Types des colonnes des lieux (shop.csv) et des billets de référence (master_data.csv)
+Mode « compact » : catégories pour les colonnes à faible cardinalité, coordonnées en float32,
+booléens pour AVAILABILITY et dates parsées pour DATE
+Ce mode sert à la lecture (application) ; les écritures de shop.csv repartent toujours du CSV brut
+"""
+
+import pandas as pd
+
+SHOP_FILE = 'data/shop.csv'
+REFERENCE_FILE = 'data/master_data.csv'
+
+SHOP_CATEGORIES = ['PAYS', 'VILLE', 'CODE', 'Mode de vente', 'TYPE DE LIEU']
+REFERENCE_CATEGORIES = ['CODE', 'CITY', 'COUNTRY', 'POSTAL_CODE']
+COORDINATE_COLUMNS = ['LATITUDE', 'LONGITUDE']
+DATE_FORMAT = '%d/%m/%Y'
+
+
+def text(series):
+    """Colonne en texte, valeurs manquantes remplacées par '' (fonctionne aussi pour les catégories)"""
+    return series.astype('string').fillna('')
+
+
+def shop_dtypes():
+    """Types à appliquer à la lecture de shop.csv"""
+    dtypes = {column: 'category' for column in SHOP_CATEGORIES}
+    dtypes.update({column: 'float32' for column in COORDINATE_COLUMNS})
+    return dtypes
+
+
+def reference_dtypes():
+    """Types à appliquer à la lecture de master_data.csv"""
+    dtypes = {column: 'category' for column in REFERENCE_CATEGORIES}
+    dtypes['AVAILABILITY'] = 'bool'
+    return dtypes
+
+
+def apply_reference_dtypes(df_ref):
+    """Convertit un DataFrame de billets de référence au format compact"""
+    return df_ref.astype(reference_dtypes())
+
+
+def read_shops(path=SHOP_FILE):
+    """Lit shop.csv au format compact"""
+    df = pd.read_csv(path, dtype=shop_dtypes())
+    df['DATE'] = pd.to_datetime(df['DATE'], format=DATE_FORMAT, errors='coerce')
+    return df
+
+
+def read_reference(path=REFERENCE_FILE):
+    """Lit master_data.csv au format compact"""
+    return pd.read_csv(path, dtype=reference_dtypes())
+
+
+def concat_shops(df, new):
+    """
+    Ajoute des lieux au format compact à df
+    Les nouvelles valeurs sont ajoutées en fin de catégories : les codes des lignes existantes ne changent pas
+    """
+    # Types des colonnes de df (ex: colonne vide dans les nouvelles lignes, lue comme float)
+    new = new.astype({column: df[column].dtype for column in df.columns if column not in SHOP_CATEGORIES})
+    df_columns, new_columns = {}, {}
+    for column in SHOP_CATEGORIES:
+        categories = df[column].cat.categories
+        extra = [value for value in new[column].dropna().unique() if value not in categories]
+        if extra:
+            df_columns[column] = df[column].cat.add_categories(extra)
+            categories = df_columns[column].cat.categories
+        new_columns[column] = new[column].astype(pd.CategoricalDtype(categories))
+    return pd.concat([df.assign(**df_columns), new.assign(**new_columns)], ignore_index=True)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Instantané colonnaire (Arrow/Feather, non compressé) d'un CSV, à côté du fichier source
+- lu par projection de colonnes et en mémoire mappée : pas d'analyse du texte CSV au démarrage
+- régénéré seulement si le CSV a changé (date de modification et taille, puis empreinte SHA-256)
+
+Construction manuelle (sinon faite automatiquement à la première lecture) :
+    python snapshot.py data/master_data.csv
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from schema import REFERENCE_FILE, read_reference
+
+SNAPSHOT_SUFFIX = '.arrow'
+
+# Métadonnées enregistrées dans le schéma Arrow pour savoir de quelle version du CSV vient l'instantané
+_MTIME = b'source_mtime_ns'
+_SIZE = b'source_size'
+_SHA256 = b'source_sha256'
+
+
+def snapshot_path(csv_path):
+    """Chemin de l'instantané associé à un CSV (ex: data/master_data.arrow)"""
+    return os.path.splitext(csv_path)[0] + SNAPSHOT_SUFFIX
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_metadata(path):
+    try:
+        return feather.read_table(path, columns=[], memory_map=True).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def is_fresh(csv_path, path=None):
+    """Vrai si l'instantané existe et correspond au contenu actuel du CSV"""
+    path = path or snapshot_path(csv_path)
+    metadata = _read_metadata(path) if os.path.exists(path) else None
+    if not metadata or _SHA256 not in metadata:
+        return False
+    stat = os.stat(csv_path)
+    if metadata.get(_MTIME) == str(stat.st_mtime_ns).encode() and metadata.get(_SIZE) == str(stat.st_size).encode():
+        return True
+    # Date modifiée (ex: git checkout) mais contenu peut-être identique : comparer l'empreinte
+    return metadata[_SHA256] == file_sha256(csv_path).encode()
+
+
+def build_snapshot(csv_path=REFERENCE_FILE, read_csv=read_reference):
+    """(Re)construit l'instantané d'un CSV, de façon atomique ; retourne son chemin"""
+    path = snapshot_path(csv_path)
+    stat = os.stat(csv_path)
+    table = pa.Table.from_pandas(read_csv(csv_path), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata.update({
+        _MTIME: str(stat.st_mtime_ns).encode(),
+        _SIZE: str(stat.st_size).encode(),
+        _SHA256: file_sha256(csv_path).encode(),
+    })
+    table = table.replace_schema_metadata(metadata)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def read_snapshot(csv_path=REFERENCE_FILE, columns=None, read_csv=read_reference):
+    """
+    Lit les colonnes demandées (toutes si None) depuis l'instantané, reconstruit au besoin
+    Les types du format compact (catégories, booléens) sont conservés
+    """
+    if not is_fresh(csv_path):
+        build_snapshot(csv_path, read_csv=read_csv)
+    table = feather.read_table(snapshot_path(csv_path), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def main():
+    for csv_path in sys.argv[1:] or [REFERENCE_FILE]:
+        if is_fresh(csv_path):
+            print(f"✓ {snapshot_path(csv_path)} est à jour")
+        else:
+            print(f"💾 {snapshot_path(csv_path)} généré depuis {csv_path}")
+            build_snapshot(csv_path)
+
+
+if __name__ == "__main__":
+    main()
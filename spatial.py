@@ -0,0 +1,200 @@
+"""
+Recherches spatiales sur les lieux
+- index en grille régulière (degrés) pour ne récupérer que les lieux d'un rectangle (la vue courante de la carte)
+- recherche des lieux les plus proches d'un point (distance haversine vectorisée)
+"""
+
+import math
+import re
+
+import numpy as np
+
+from schema import text
+
+# Taille d'une cellule de la grille, en degrés (~25 km en latitude)
+CELL_SIZE = 0.25
+# Décalage pour que les numéros de ligne/colonne soient positifs dans la clé entière
+_OFFSET = 1000
+_STRIDE = 10000
+
+
+def expand_bounds(bounds, margin=0.2):
+    """Agrandit un rectangle (south, west, north, east) d'une fraction de sa taille de chaque côté"""
+    south, west, north, east = bounds
+    d_lat = (north - south) * margin
+    d_lon = (east - west) * margin
+    return max(south - d_lat, -90.0), max(west - d_lon, -180.0), min(north + d_lat, 90.0), min(east + d_lon, 180.0)
+
+
+def bounds_from_leaflet(bounds):
+    """Convertit les limites renvoyées par st_folium ({'_southWest': {...}, '_northEast': {...}}) en (south, west, north, east)"""
+    try:
+        south_west, north_east = bounds['_southWest'], bounds['_northEast']
+        return south_west['lat'], south_west['lng'], north_east['lat'], north_east['lng']
+    except (KeyError, TypeError):
+        return None
+
+
+def estimate_bounds(center_lat, center_lon, zoom, width_px=1200, height_px=600):
+    """Rectangle visible approximatif d'une carte Web Mercator (tuiles de 256 px) centrée au niveau de zoom donné"""
+    deg_per_px = 360.0 / (256 * 2 ** zoom)
+    half_width = width_px / 2 * deg_per_px
+    half_height = height_px / 2 * deg_per_px * math.cos(math.radians(center_lat))
+    return (
+        max(center_lat - half_height, -90.0),
+        max(center_lon - half_width, -180.0),
+        min(center_lat + half_height, 90.0),
+        min(center_lon + half_width, 180.0),
+    )
+
+
+class GridIndex:
+    """
+    Index des points par cellule de grille : clé de cellule -> positions des points
+    query_bbox() ne regarde que les cellules qui recoupent le rectangle demandé
+    """
+
+    def __init__(self, latitudes, longitudes, labels, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.labels = np.asarray(labels)
+
+        keys = self._keys(self._cell(self.latitudes), self._cell(self.longitudes))
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        self.cells = dict(zip(unique_keys.tolist(), np.split(order, starts[1:])))
+        self._cell_keys = unique_keys
+
+    @classmethod
+    def from_dataframe(cls, df, cell_size=CELL_SIZE):
+        """Index des lieux ayant des coordonnées ; les requêtes retournent les libellés d'index de df"""
+        df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+        return cls(df['LATITUDE'], df['LONGITUDE'], df.index, cell_size=cell_size)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _cell(self, values):
+        return np.floor(np.asarray(values, dtype=float) / self.cell_size).astype(np.int64)
+
+    @staticmethod
+    def _keys(rows, cols):
+        return (rows + _OFFSET) * _STRIDE + (cols + _OFFSET)
+
+    def _candidates(self, south, west, north, east):
+        """Positions des points des cellules qui recoupent le rectangle"""
+        row_min, row_max = self._cell(south), self._cell(north)
+        col_min, col_max = self._cell(west), self._cell(east)
+        n_cells = (row_max - row_min + 1) * (col_max - col_min + 1)
+
+        if n_cells <= len(self.cells):
+            keys = [
+                key
+                for row in range(row_min, row_max + 1)
+                for key in self._keys(row, np.arange(col_min, col_max + 1)).tolist()
+                if key in self.cells
+            ]
+        else:
+            # Grand rectangle : filtrer directement les cellules occupées
+            rows = self._cell_keys // _STRIDE - _OFFSET
+            cols = self._cell_keys % _STRIDE - _OFFSET
+            mask = (rows >= row_min) & (rows <= row_max) & (cols >= col_min) & (cols <= col_max)
+            keys = self._cell_keys[mask].tolist()
+
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.cells[key] for key in keys])
+
+    def query_bbox(self, south, west, north, east):
+        """Libellés des points situés dans le rectangle (gère le passage de l'antiméridien si west > east)"""
+        if west > east:
+            positions = np.concatenate([
+                self._positions_in(south, west, north, 180.0),
+                self._positions_in(south, -180.0, north, east),
+            ])
+        else:
+            positions = self._positions_in(south, west, north, east)
+        return self.labels[np.sort(positions)]
+
+    def _positions_in(self, south, west, north, east):
+        candidates = self._candidates(south, west, north, east)
+        lat = self.latitudes[candidates]
+        lon = self.longitudes[candidates]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return candidates[inside]
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+_COORDINATES = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*[,; ]\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def parse_coordinates(text):
+    """Lit 'latitude, longitude' (ex: '48.8573, 2.2945') ; None si le texte n'est pas un couple valide"""
+    match = _COORDINATES.match(text or '')
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def haversine_km(lat, lon, latitudes, longitudes):
+    """Distances (km) entre un point et des tableaux de points, en degrés ; calcul vectorisé"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class NearestIndex:
+    """
+    Recherche des lieux les plus proches d'un point (k plus proches et/ou dans un rayon)
+    Les colonnes utiles sont extraites une fois en tableaux numpy ; chaque requête est vectorisée
+    """
+
+    def __init__(self, df):
+        self.df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+        self.latitudes = self.df['LATITUDE'].to_numpy(dtype=float)
+        self.longitudes = self.df['LONGITUDE'].to_numpy(dtype=float)
+        self.codes = text(self.df['CODE']).str.strip().str.upper().to_numpy()
+        self.milesimes = text(self.df['MILESIME']).str.strip().to_numpy()
+
+    def __len__(self):
+        return len(self.df)
+
+    def query(self, lat, lon, k=10, radius_km=None, code=None, milesime=None):
+        """
+        Lieux les plus proches de (lat, lon), triés par distance, avec une colonne DISTANCE_KM
+        k=None : tous les lieux du rayon ; code / milesime : seulement les lieux vendant ce billet
+        """
+        mask = np.ones(len(self.df), dtype=bool)
+        if code:
+            mask &= self.codes == code.strip().upper()
+        if milesime:
+            mask &= self.milesimes == milesime.strip()
+        if radius_km is not None:
+            # Pré-filtre peu coûteux sur la latitude avant le calcul trigonométrique
+            mask &= np.abs(self.latitudes - lat) <= np.degrees(radius_km / EARTH_RADIUS_KM)
+
+        candidates = np.flatnonzero(mask)
+        distances = haversine_km(lat, lon, self.latitudes[candidates], self.longitudes[candidates])
+        if radius_km is not None:
+            inside = distances <= radius_km
+            candidates, distances = candidates[inside], distances[inside]
+
+        if k is not None and len(distances) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+
+        result = self.df.iloc[candidates[order]].copy()
+        result['DISTANCE_KM'] = distances[order]
+        return result
+
+
+def nearest_shops(df, lat, lon, k=10, radius_km=None, code=None, milesime=None):
+    """Raccourci : k lieux de df les plus proches de (lat, lon), voir NearestIndex.query"""
+    return NearestIndex(df).query(lat, lon, k=k, radius_km=radius_km, code=code, milesime=milesime)
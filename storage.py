@@ -0,0 +1,142 @@
+"""
+Écriture des données des lieux (shop.csv)
+- ajout d'une ligne en fin de fichier, sans réécrire le fichier entier
+- réécriture complète atomique (fichier temporaire puis remplacement)
+Les écritures sont protégées par un verrou de fichier pour que plusieurs sessions ne s'écrasent pas
+parse_rows convertit les lignes écrites au format compact, pour les ajouter au DataFrame en mémoire
+"""
+
+import csv
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pandas as pd
+
+from schema import SHOP_FILE, read_shops
+from validation import normalize_shops
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path):
+    """Verrou exclusif inter-processus associé à un fichier (fichier compagnon '<path>.lock')"""
+    with open(path + '.lock', 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def file_stamp(path):
+    """(date de modification, taille) du fichier, None s'il n'existe pas"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _format_value(value):
+    """Valeur telle qu'écrite par pandas.to_csv (valeurs manquantes -> champ vide)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    return value
+
+
+def read_header(path=SHOP_FILE):
+    """Retourne la liste des colonnes du fichier CSV"""
+    with open(path, encoding='utf-8', newline='') as f:
+        return next(csv.reader(f))
+
+
+def format_row(row, header):
+    """Ligne CSV d'un lieu (dict colonne -> valeur), dans l'ordre des colonnes de header"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow([_format_value(row.get(column)) for column in header])
+    return buffer.getvalue()
+
+
+def parse_rows(rows, header):
+    """Lieux (dicts) au format compact et normalisés, avec exactement les types d'une relecture de shop.csv"""
+    text = format_row({column: column for column in header}, header)
+    text += ''.join(format_row(row, header) for row in rows)
+    return normalize_shops(read_shops(io.StringIO(text)))[0]
+
+
+def append_row(row, path=SHOP_FILE):
+    """
+    Ajoute une ligne (dict colonne -> valeur) à la fin du fichier CSV, dans l'ordre de son en-tête
+    Coût indépendant du nombre de lignes déjà présentes
+    Retourne file_stamp du fichier juste avant et juste après l'ajout (pris sous le verrou)
+    """
+    with file_lock(path):
+        before = file_stamp(path)
+        header = read_header(path)
+        line = format_row(row, header).encode('utf-8')
+
+        with open(path, 'rb+') as f:
+            # S'assurer que le fichier se termine par un retour à la ligne avant d'ajouter
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    line = b'\n' + line
+            f.seek(0, os.SEEK_END)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        return before, file_stamp(path)
+
+
+def _replace_file(df, path):
+    """Écrit df dans un fichier temporaire puis remplace path (à appeler sous file_lock)"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_shops(df, path=SHOP_FILE):
+    """Réécrit tout le fichier de façon atomique (jamais de fichier à moitié écrit)"""
+    with file_lock(path):
+        _replace_file(df, path)
+
+
+def update_shops(update, path=SHOP_FILE):
+    """
+    Relit le fichier sous le verrou, applique update(df) -> df puis le remplace de façon atomique
+    Les lignes ajoutées par d'autres sessions pendant un long traitement ne sont pas perdues
+    """
+    with file_lock(path):
+        _replace_file(update(pd.read_csv(path)), path)
+
+
+def append_rows(df_new, path=SHOP_FILE):
+    """
+    Ajoute plusieurs lignes en une seule écriture atomique : le fichier est relu sous le verrou,
+    complété puis remplacé (soit toutes les lignes sont ajoutées, soit aucune)
+    """
+    with file_lock(path):
+        df = pd.read_csv(path)
+        _replace_file(pd.concat([df, df_new.reindex(columns=df.columns)], ignore_index=True), path)
@@ -1,11 +1,29 @@
 import streamlit as st
 import pandas as pd
-import folium
 from streamlit_folium import st_folium
 from datetime import datetime
-from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
+import os
+
+from async_geocoding import BackgroundGeocoder
+from batch_geocoding import NOMINATIM_RATE, TokenBucket, rate_limited
+from catalog import ShopCatalog, coverage_table, filter_coverage, shop_years
+from bulk_import import geocode_rows, prepare_import, read_upload
+from database import ShopDatabase, DB_FILE
+from datastore import DataStore, IndexCache
+from duplicates import DuplicateIndex
+from facets import FacetIndex, facet_counts
+from geocode_missing import build_queries
+from geocoders import get_geocoder
+from geocoding import GeocodeCache
+from map_rendering import build_marker_specs, build_map, build_feature_group, MapCache
+from profiling import PerfLog, add_time, count, finish_run, gauge, profiled, start_run, timer
+from reference_index import ReferenceIndex, REFERENCE_INDEX_COLUMNS
+from schema import DATE_FORMAT, REFERENCE_FILE, SHOP_FILE, apply_reference_dtypes, concat_shops, shop_dtypes
+from snapshot import read_snapshot
+from spatial import GridIndex, NearestIndex, bounds_from_leaflet, estimate_bounds, expand_bounds, parse_coordinates
+from storage import append_row, append_rows, parse_rows
+from validation import is_valid_value, normalize_shops
 
 # Configuration de la page
 st.set_page_config(
@@ -15,6 +33,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Mesure des temps de cette exécution du script (panneau « ⏱️ Performance » caché, voir profiling.py)
+start_run(st.session_state.get('page', 'carte'))
+if 'geocode_elapsed' in st.session_state:
+    add_time('geocode_job', st.session_state.pop('geocode_elapsed'))
+PERF_PANEL = os.environ.get('PERF_PANEL') == '1' or st.query_params.get('perf') == '1'
+
 # Initialiser l'état de session pour la navigation
 if 'page' not in st.session_state:
     st.session_state.page = 'carte'
@@ -27,58 +51,28 @@ if 'geocoded_lon' not in st.session_state:
 if 'geocode_message' not in st.session_state:
     st.session_state.geocode_message = ''
 
-def is_valid_value(value):
-    """Vérifie si une valeur est valide (non NaN, non None, non vide)"""
-    if pd.isna(value):
-        return False
-    if value is None:
-        return False
-    if isinstance(value, str):
-        value_clean = value.strip().lower()
-        if not value_clean or value_clean in ['nan', 'null', 'none', '--', '']:
-            return False
-    return True
-
-def geocode_address_simple(pays, ville, lieu, adresse):
-    """Essaie de géocoder une adresse en utilisant plusieurs stratégies"""
-    geolocator = Nominatim(user_agent="euro-souvenir-app/1.0")
-    queries = []
-    
-    # Stratégie 1: Adresse complète
-    if is_valid_value(adresse):
-        parts = [adresse.strip()]
-        if is_valid_value(ville):
-            parts.append(ville.strip())
-        if is_valid_value(pays):
-            parts.append(pays.strip())
-        if len(parts) >= 2:
-            queries.append(", ".join(parts))
-    
-    # Stratégie 2: Lieu + ville + pays
-    if is_valid_value(lieu):
-        parts = [lieu.strip()]
-        if is_valid_value(ville):
-            parts.append(ville.strip())
-        if is_valid_value(pays):
-            parts.append(pays.strip())
-        if len(parts) >= 2:
-            queries.append(", ".join(parts))
-    
-    # Stratégie 3: Ville + pays seulement
-    if is_valid_value(ville) and is_valid_value(pays):
-        queries.append(f"{ville.strip()}, {pays.strip()}")
-    
-    # Essayer chaque requête
-    for query in queries:
-        try:
-            location = geolocator.geocode(query, timeout=10)
-            if location:
-                return location.latitude, location.longitude, f"✅ Coordonnées trouvées pour : {query}"
-        except (GeocoderTimedOut, GeocoderServiceError):
-            time.sleep(1)
-            continue
-    
-    # Construire le message d'erreur avec suggestions
+@st.cache_resource
+def get_geocode_cache():
+    """Cache persistant des géocodages, partagé avec geocode_missing.py"""
+    return GeocodeCache()
+
+@st.cache_resource
+def get_app_geocoder():
+    """Backend de géocodage choisi par GEOCODER_BACKEND (nominatim, offline ou hybrid)"""
+    return get_geocoder()
+
+@st.cache_resource
+def get_rate_limiter():
+    """Seau à jetons unique du processus : formulaire, import en masse et recherche respectent ensemble le quota"""
+    return TokenBucket(NOMINATIM_RATE)
+
+@st.cache_resource
+def get_background_geocoder():
+    """Pool de géocodage en arrière-plan partagé par les sessions (formulaire d'ajout)"""
+    return BackgroundGeocoder(get_app_geocoder(), cache=get_geocode_cache(), bucket=get_rate_limiter())
+
+def geocode_failure_message(pays, ville, lieu, adresse):
+    """Message d'échec du géocodage, avec les champs à compléter"""
     missing = []
     if not is_valid_value(adresse):
         missing.append("Adresse")
@@ -90,70 +84,346 @@ def geocode_address_simple(pays, ville, lieu, adresse):
         missing.append("Pays")
     
     if missing:
-        return None, None, f"❌ Coordonnées non trouvées. Veuillez renseigner : {', '.join(missing)}"
+        return f"❌ Coordonnées non trouvées. Veuillez renseigner : {', '.join(missing)}"
     else:
-        return None, None, "❌ Coordonnées non trouvées. Vérifiez l'exactitude de l'adresse."
+        return "❌ Coordonnées non trouvées. Vérifiez l'exactitude de l'adresse."
+
+@st.fragment(run_every=0.5)
+def geocode_progress():
+    """Suit le géocodage lancé en arrière-plan ; relance la page quand le résultat est arrivé"""
+    job = st.session_state.get('geocode_job')
+    if job is None:
+        return
+    if not job.done():
+        st.info(f"🔍 Recherche des coordonnées GPS... ({job.elapsed():.0f} s)")
+        return
+    st.session_state.geocode_job = None
+    # Durée reportée dans la mesure de l'exécution complète qui suit (panneau « ⏱️ Performance »)
+    st.session_state.geocode_elapsed = job.elapsed()
+    if job.result is not None:
+        lat, lon, query = job.result
+        st.session_state.geocoded_lat = str(lat)
+        st.session_state.geocoded_lon = str(lon)
+        st.session_state.geocode_message = f"✅ Coordonnées trouvées pour : {query}"
+    else:
+        st.session_state.geocode_message = geocode_failure_message(*st.session_state.geocode_fields)
+    st.rerun()
+
+def cancel_geocoding():
+    """Abandonne le géocodage en arrière-plan de la session, s'il y en a un"""
+    job = st.session_state.pop('geocode_job', None)
+    if job is not None:
+        job.cancel()
+
+# Au-delà de ce nombre de lieux, seuls les marqueurs de la vue courante de la carte sont envoyés
+VIEWPORT_THRESHOLD = 500
+
+# Source des données : fichiers CSV (défaut) ou base SQLite (DATA_BACKEND=sqlite, voir database.py)
+DATA_BACKEND = os.environ.get('DATA_BACKEND', 'csv')
+
+@st.cache_resource
+def get_database():
+    """Accès à la base SQLite (mode DATA_BACKEND=sqlite)"""
+    return ShopDatabase()
 
 # Chargement des données
-@st.cache_data
+# Les DataFrames sont typés au format compact (catégories, float32, dates) et gardés dans le DataStore :
+# toutes les sessions partagent le même objet, sans copie ni sérialisation à chaque rerun (ne pas les modifier)
+def read_raw_shops():
+    """Lieux tels qu'ils sont stockés, avant normalisation"""
+    if DATA_BACKEND == 'sqlite':
+        return get_database().shops()
+    return pd.read_csv(SHOP_FILE, dtype=shop_dtypes())
+
+@profiled('load_data')
+def read_data():
+    """Charge les lieux puis les normalise colonne par colonne (voir validation.py)"""
+    return normalize_shops(read_raw_shops())[0]
+
+# Colonnes des billets de référence gardées en mémoire : index du formulaire et vue jointe (voir catalog.py)
+REFERENCE_COLUMNS = REFERENCE_INDEX_COLUMNS + ['AVAILABILITY', 'POSTAL_CODE']
+
+@profiled('load_reference_data')
+def read_reference_data():
+    """
+    Charge les colonnes utiles des billets de référence
+    En mode CSV, la lecture passe par l'instantané colonnaire data/master_data.arrow (voir snapshot.py)
+    """
+    if DATA_BACKEND == 'sqlite':
+        return apply_reference_dtypes(get_database().reference())[REFERENCE_COLUMNS]
+    return read_snapshot(REFERENCE_FILE, columns=REFERENCE_COLUMNS)
+
+@st.cache_resource
+def get_data_store():
+    """
+    Lieux et billets de référence, une seule copie par processus quel que soit le nombre de sessions
+    Chaque fichier est surveillé et relu seul quand il change (voir datastore.py)
+    """
+    store = DataStore()
+    if DATA_BACKEND == 'sqlite':
+        # Une seule base pour les deux sources : chacune suit le compteur de modifications de sa table
+        database = get_database()
+        store.watch('shops', DB_FILE, read_data, on_change=lambda version: invalidate_shop_caches(),
+                    stamp=lambda: database.table_version('shops'))
+        store.watch('reference', DB_FILE, read_reference_data, stamp=lambda: database.table_version('reference'))
+    else:
+        store.watch('shops', SHOP_FILE, read_data, on_change=lambda version: invalidate_shop_caches())
+        store.watch('reference', REFERENCE_FILE, read_reference_data)
+    return store
+
 def load_data():
-    df = pd.read_csv('data/shop.csv')
-    return df
+    return get_data_store().get('shops')
 
-@st.cache_data
 def load_reference_data():
-    """Charge les données de référence de tous les billets"""
-    df_ref = pd.read_csv('data/master_data.csv')
-    return df_ref
+    """Billets de référence (colonnes de REFERENCE_COLUMNS)"""
+    return get_data_store().get('reference')
+
+@st.cache_resource(max_entries=1)
+def load_reference_index(reference_version):
+    """Construit une seule fois par version l'index des billets de référence (recherche par '#' et par CODE/MILLÉSIME)"""
+    return ReferenceIndex(load_reference_data()[REFERENCE_INDEX_COLUMNS])
+
+def get_data_version():
+    """Numéro de version des lieux publié par le DataStore (incrémenté à chaque modification de shop.csv ou de la base)"""
+    return get_data_store().version('shops')
 
-def save_data(df):
-    df.to_csv('data/shop.csv', index=False)
-    st.cache_data.clear()  # Effacer le cache pour recharger les nouvelles données
+@st.cache_resource
+def get_facet_cache():
+    """Index des facettes (pays, villes, types, modes de vente, statistiques) partagé par les sessions"""
+    return IndexCache(FacetIndex)
 
-df = load_data()
-df_reference = load_reference_data()
+def load_facets(data_version):
+    """Index des facettes pour la version courante des données"""
+    if DATA_BACKEND == 'sqlite':
+        return get_facet_cache().get(data_version, get_database().facet_counts)
+    return get_facet_cache().get(data_version, lambda: facet_counts(load_data()))
 
-# Filtrer les données avec coordonnées valides
-df_with_coords = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+@st.cache_resource
+def get_duplicate_cache():
+    """Index des doublons (billet au même lieu ou aux mêmes coordonnées) partagé par les sessions"""
+    return IndexCache(DuplicateIndex)
+
+def load_duplicate_index(data_version):
+    """Index des doublons pour la version courante des données"""
+    return get_duplicate_cache().get(data_version, load_data)
+
+@st.cache_resource(max_entries=1)
+def load_catalog(data_version, reference_version):
+    """Lieux joints aux billets de référence, une fois par version des deux sources (mode CSV, voir catalog.py)"""
+    return ShopCatalog(load_data(), load_reference_data())
+
+@st.cache_resource(max_entries=1)
+def load_shop_years(data_version):
+    """Années des millésimes des lieux, pour le filtre « Année du billet »"""
+    if DATA_BACKEND == 'sqlite':
+        return get_database().years()
+    return sorted(shop_years(load_data()).dropna().unique())
+
+@st.cache_resource(max_entries=1)
+def load_coverage(data_version, reference_version):
+    """Nombre de lieux par billet de référence (comptage SQL en mode SQLite)"""
+    if DATA_BACKEND == 'sqlite':
+        counts = get_database().note_counts()
+    else:
+        counts = load_data()['#'].value_counts()
+    return coverage_table(load_reference_data(), counts)
+
+@st.cache_resource(max_entries=1)
+def load_validation_report(data_version):
+    """
+    Rapport de contrôle qualité de la version courante des lieux, établi à la demande
+    Les données brutes sont relues : le DataFrame en mémoire est déjà normalisé (et complété sur place à chaque ajout)
+    """
+    return normalize_shops(read_raw_shops())[1]
+
+@st.cache_resource(max_entries=32)
+def load_display(pays, ville, data_version, note_filter=None):
+    """
+    Lieux avec coordonnées pour le pays et la ville choisis (None = tous)
+    note_filter = (disponibles uniquement, année ou None, version des billets de référence), ou None
+    """
+    available_only, year = note_filter[:2] if note_filter is not None else (False, None)
+    if DATA_BACKEND == 'sqlite':
+        return normalize_shops(get_database().shops(
+            pays=pays, ville=ville, with_coords=True, available_only=available_only, year=year
+        ))[0]
+    df_display = load_data()
+    if note_filter is not None:
+        df_display = df_display.loc[load_catalog(data_version, note_filter[2]).select(available_only, year)]
+    df_display = df_display.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    if pays is not None:
+        df_display = df_display[df_display['PAYS'] == pays]
+    if ville is not None:
+        df_display = df_display[df_display['VILLE'] == ville]
+    return df_display
+
+@st.cache_resource(max_entries=2)
+def load_marker_specs(data_version):
+    """Popups, infobulles et couleurs des marqueurs, calculés une fois par version des données"""
+    return build_marker_specs(load_data())
+
+@st.cache_resource(max_entries=32)
+def load_filtered_marker_specs(pays, ville, data_version, note_filter=None):
+    """Marqueurs des seuls lieux filtrés (mode SQLite, où les données ne sont pas chargées en entier)"""
+    return build_marker_specs(load_display(pays, ville, data_version, note_filter))
+
+def get_marker_specs(pays, ville, data_version, note_filter=None):
+    """Marqueurs pré-calculés couvrant au moins les lieux du filtre"""
+    if DATA_BACKEND == 'sqlite':
+        return load_filtered_marker_specs(pays, ville, data_version, note_filter)
+    return load_marker_specs(data_version)
+
+@st.cache_resource(max_entries=32)
+def load_spatial_index(pays, ville, data_version, note_filter=None):
+    """Index spatial (grille) des lieux filtrés, pour n'envoyer que ceux de la vue courante"""
+    return GridIndex.from_dataframe(load_display(pays, ville, data_version, note_filter))
+
+@st.cache_resource(max_entries=2)
+def load_nearest_index(data_version):
+    """Index de recherche des lieux les plus proches d'un point"""
+    return NearestIndex(load_data())
+
+@st.cache_resource
+def get_perf_log():
+    """Historique des mesures de performance, partagé par toutes les sessions"""
+    return PerfLog()
+
+@st.cache_resource
+def get_map_cache():
+    """Cache LRU des cartes construites, partagé par toutes les sessions"""
+    return MapCache()
+
+def invalidate_shop_caches():
+    """
+    Libère les caches dérivés des lieux quand une nouvelle version est publiée
+    (leurs clés contiennent la version : ils ne seraient de toute façon plus servis)
+    """
+    load_display.clear()
+    load_marker_specs.clear()
+    load_filtered_marker_specs.clear()
+    load_spatial_index.clear()
+    load_catalog.clear()
+    load_shop_years.clear()
+    load_coverage.clear()
+    load_nearest_index.clear()
+    get_map_cache().clear()
+
+def append_shop(row):
+    """Ajoute un lieu en fin de shop.csv (ou dans la base) sans réécrire le fichier"""
+    if DATA_BACKEND == 'sqlite':
+        write = lambda: get_database().append_shop(row)
+    else:
+        write = lambda: append_row(row)
+    # Le DataFrame et les facettes sont complétés sur place plutôt que relus et recalculés
+    old_version, new_version = get_data_store().apply(
+        'shops', write, lambda df: concat_shops(df, parse_rows([row], list(df.columns)))
+    )
+    get_facet_cache().add_row(row, old_version, new_version)
+    get_duplicate_cache().add_row(row, old_version, new_version)
+
+def import_shops(df_new):
+    """Ajoute un lot de lieux en une seule écriture atomique (ou une seule transaction SQLite)"""
+    if DATA_BACKEND == 'sqlite':
+        get_database().append_shops(df_new)
+    else:
+        append_rows(df_new)
+    get_data_store().reset('shops')
+
+data_version = get_data_version()
+facets = load_facets(data_version)
 
 # Sidebar - Filtres en premier
 st.sidebar.header("🔍 Filtres")
 
 # Filtre par pays
-pays_list = ['Tous'] + sorted(df['PAYS'].dropna().unique().tolist())
+pays_list = ['Tous'] + facets.countries()
 selected_pays = st.sidebar.selectbox("Pays", pays_list)
+pays_filter = selected_pays if selected_pays != 'Tous' else None
 
 # Filtre par ville
-if selected_pays != 'Tous':
-    df_filtered = df[df['PAYS'] == selected_pays]
-else:
-    df_filtered = df
-
-villes_list = ['Toutes'] + sorted(df_filtered['VILLE'].dropna().unique().tolist())
+villes_list = ['Toutes'] + facets.cities(pays_filter)
 selected_ville = st.sidebar.selectbox("Ville", villes_list)
+ville_filter = selected_ville if selected_ville != 'Toutes' else None
 
-# Appliquer les filtres pour calculer les stats
-if selected_pays != 'Tous':
-    df_display = df_with_coords[df_with_coords['PAYS'] == selected_pays]
-else:
-    df_display = df_with_coords
+# Filtres sur les billets (vue jointe avec master_data.csv)
+reference_version = get_data_store().version('reference')
+available_only = st.sidebar.checkbox("Billets encore disponibles uniquement")
+selected_year = st.sidebar.selectbox("Année du billet", ['Toutes'] + load_shop_years(data_version)[::-1])
+year_filter = selected_year if selected_year != 'Toutes' else None
+note_filter = (available_only, year_filter, reference_version) if available_only or year_filter else None
 
-if selected_ville != 'Toutes':
-    df_display = df_display[df_display['VILLE'] == selected_ville]
+# Appliquer les filtres pour calculer les stats
+with timer('filtres'):
+    df_display = load_display(pays_filter, ville_filter, data_version, note_filter)
 
 # Statistiques dans la sidebar (après filtres)
 st.sidebar.markdown("---")
 st.sidebar.header("📊 Statistiques")
 
+if note_filter is None:
+    nb_lieux, nb_pays, nb_villes = facets.stats(pays_filter, ville_filter)
+else:
+    # Facettes précalculées sans filtre sur les billets : statistiques des seuls lieux retenus
+    nb_lieux, nb_pays, nb_villes = len(df_display), df_display['PAYS'].nunique(), df_display['VILLE'].nunique()
+
 col1, col2 = st.sidebar.columns(2)
 with col1:
-    st.metric("Lieux affichés", len(df_display))
+    st.metric("Lieux affichés", nb_lieux)
 with col2:
-    st.metric("Pays", df_display['PAYS'].nunique())
+    st.metric("Pays", nb_pays)
 
 col3, col4 = st.sidebar.columns(2)
 with col3:
-    st.metric("Villes", df_display['VILLE'].nunique())
+    st.metric("Villes", nb_villes)
+
+# Contrôle qualité des données, pour la version affichée (voir validation.py)
+if st.sidebar.toggle("🧹 Qualité des données", key="show_quality"):
+    validation_report = load_validation_report(data_version)
+    for label, n in validation_report.summary():
+        st.sidebar.markdown(f"- {label} : **{n}**")
+    st.sidebar.caption(f"{validation_report.rows} lignes contrôlées, {validation_report.issues()} problèmes")
+
+# Recherche des lieux les plus proches d'une adresse ou de coordonnées
+st.sidebar.markdown("---")
+with st.sidebar.expander("📍 Lieux les plus proches"):
+    near_position = st.text_input("Adresse ou coordonnées", placeholder="Ex: 48.8573, 2.2945 ou Tour Eiffel, Paris", key="near_position")
+    col_near_code, col_near_milesime = st.columns(2)
+    with col_near_code:
+        near_code = st.text_input("CODE", placeholder="Ex: UEBU", key="near_code")
+    with col_near_milesime:
+        near_milesime = st.text_input("Millésime", placeholder="Ex: 2025-6", key="near_milesime")
+    near_k = st.number_input("Nombre de lieux", min_value=1, max_value=50, value=5, key="near_k")
+    near_radius = st.number_input("Rayon (km, 0 = illimité)", min_value=0, max_value=5000, value=0, key="near_radius")
+    
+    if st.button("🔍 Chercher à proximité", key="near_search", width="stretch"):
+        position = parse_coordinates(near_position)
+        if position is None and near_position.strip():
+            try:
+                with timer('geocode_recherche'):
+                    geolocator = rate_limited(get_app_geocoder(), get_rate_limiter())
+                    location = get_geocode_cache().geocode(geolocator, near_position.strip(), timeout=10)
+            except (GeocoderTimedOut, GeocoderServiceError):
+                location = None
+            if location:
+                position = (location.latitude, location.longitude)
+        
+        if position is None:
+            st.warning("⚠️ Position introuvable. Entrez une adresse ou des coordonnées (latitude, longitude).")
+        else:
+            nearest = load_nearest_index(data_version).query(
+                position[0], position[1],
+                k=int(near_k),
+                radius_km=near_radius or None,
+                code=near_code,
+                milesime=near_milesime
+            )
+            if nearest.empty:
+                st.info("Aucun lieu trouvé pour cette recherche")
+            else:
+                st.dataframe(
+                    nearest[['TITRE', 'LIEU', 'VILLE', 'DISTANCE_KM']].round({'DISTANCE_KM': 1}),
+                    hide_index=True
+                )
 
 # Bouton pour ajouter un lieu
 st.sidebar.markdown("---")
@@ -161,12 +431,19 @@ if st.sidebar.button("➕ Ajouter un lieu", type="primary", width="stretch"):
     st.session_state.page = 'ajouter'
     st.rerun()
 
-if st.session_state.page == 'ajouter' and st.sidebar.button("🗺️ Retour à la carte", width="stretch"):
+if st.sidebar.button("📥 Import en masse", width="stretch"):
+    st.session_state.page = 'import'
+    st.rerun()
+
+if st.session_state.page != 'carte' and st.sidebar.button("🗺️ Retour à la carte", width="stretch"):
+    cancel_geocoding()
     st.session_state.page = 'carte'
     st.rerun()
 
 # PAGE D'AJOUT DE LIEU
 if st.session_state.page == 'ajouter':
+    # Index des billets chargé seulement pour le formulaire d'ajout
+    reference_index = load_reference_index(get_data_store().version('reference'))
     st.title("➕ Ajouter un nouveau lieu")
     st.markdown("Remplissez les informations ci-dessous pour ajouter un nouveau lieu de vente de billets 0 euros.")
     
@@ -203,18 +480,19 @@ if st.session_state.page == 'ajouter':
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("🔍 Rechercher", type="primary"):
             if code_input and milesime_input:
-                # Construire l'ID complet
-                billet_id = f"{code_input}_{milesime_input}"
+                # Chercher dans l'index de référence (par '#' puis par CODE/MILLÉSIME)
+                billet_match = reference_index.lookup(code_input, milesime_input)
                 
-                # Chercher dans le DataFrame de référence
-                billet_match = df_reference[df_reference['#'] == billet_id]
-                
-                if not billet_match.empty:
-                    st.session_state.billet_info = billet_match.iloc[0].to_dict()
+                if billet_match is not None:
+                    st.session_state.billet_info = dict(billet_match)
                     st.success(f"✅ Billet trouvé : {st.session_state.billet_info['TITLE']}")
                 else:
                     st.session_state.billet_info = None
                     st.error("❌ Billet non trouvé. Vérifiez le CODE et le MILLÉSIME.")
+                    # Proposer des billets proches (préfixe ou faute de frappe sur le CODE)
+                    suggestions = reference_index.suggest(code_input, milesime_input, limit=8)
+                    if suggestions:
+                        st.caption("Billets proches : " + ", ".join(f"{r['CODE']} {r['YEAR']}" for r in suggestions))
             else:
                 st.warning("⚠️ Veuillez entrer le CODE et le MILLÉSIME")
     
@@ -236,6 +514,10 @@ if st.session_state.page == 'ajouter':
     if 'temp_adresse' not in st.session_state:
         st.session_state.temp_adresse = ''
     
+    # Géocodage en cours (suivi sans bloquer la page)
+    if st.session_state.get('geocode_job') is not None:
+        geocode_progress()
+    
     with st.form("add_location_form"):
         # Centrer le contenu avec des marges plus larges
         col_spacer1, col_content, col_spacer2 = st.columns([1, 8, 1])
@@ -248,9 +530,10 @@ if st.session_state.page == 'ajouter':
                 titre = st.text_input("Titre *", value=st.session_state.billet_info['TITLE'], disabled=True)
                 col_code, col_milesime = st.columns(2)
                 with col_code:
-                    code = st.text_input("Code", value=code_input, disabled=True)
+                    # Valeurs du billet trouvé (et non la saisie brute : espaces, minuscules)
+                    code = st.text_input("Code", value=st.session_state.billet_info['CODE'], disabled=True)
                 with col_milesime:
-                    milesime = st.text_input("Millésime", value=milesime_input, disabled=True)
+                    milesime = st.text_input("Millésime", value=st.session_state.billet_info['YEAR'], disabled=True)
             else:
                 titre = st.text_input("Titre *", value="", disabled=True, help="⚠️ Remplissez d'abord la section 1️⃣ ci-dessus")
                 col_code, col_milesime = st.columns(2)
@@ -282,11 +565,11 @@ if st.session_state.page == 'ajouter':
                 st.subheader("ℹ️ Détails du lieu")
                 
                 # Mode de vente - liste déroulante des valeurs existantes
-                modes_vente = [''] + sorted(df['Mode de vente'].dropna().unique().tolist())
+                modes_vente = [''] + facets.distinct('Mode de vente')
                 mode_vente = st.selectbox("Mode de vente", modes_vente)
                 
                 # Type de lieu - liste déroulante des valeurs existantes
-                types_lieu = [''] + sorted(df['TYPE DE LIEU'].dropna().unique().tolist())
+                types_lieu = [''] + facets.distinct('TYPE DE LIEU')
                 type_lieu = st.selectbox("Type de lieu", types_lieu)
                 
                 commentaire = st.text_area("Commentaire", placeholder="Informations supplémentaires...")
@@ -327,15 +610,16 @@ if st.session_state.page == 'ajouter':
             with col_cancel:
                 cancelled = st.form_submit_button("❌ Annuler", use_container_width=True)
         
-        # Géocodage si le bouton est cliqué
+        # Géocodage si le bouton est cliqué : lancé en arrière-plan, le résultat est suivi par geocode_progress()
         if geocode_btn:
             if lieu or adresse:
-                with st.spinner("🔍 Recherche des coordonnées GPS..."):
-                    lat, lon, message = geocode_address_simple(pays, ville, lieu, adresse)
-                    st.session_state.geocoded_lat = str(lat) if lat else ''
-                    st.session_state.geocoded_lon = str(lon) if lon else ''
-                    st.session_state.geocode_message = message
-                    st.rerun()
+                cancel_geocoding()
+                st.session_state.geocode_fields = (pays, ville, lieu, adresse)
+                st.session_state.geocode_message = ''
+                st.session_state.geocode_job = get_background_geocoder().submit(
+                    build_queries(pays, ville, lieu, adresse)
+                )
+                st.rerun()
             else:
                 st.session_state.geocode_message = "⚠️ Veuillez remplir au moins le champ Lieu ou Adresse"
                 st.rerun()
@@ -348,24 +632,19 @@ if st.session_state.page == 'ajouter':
                 st.error("⚠️ Les champs Lieu et Adresse sont obligatoires!")
             else:
                 # Créer une nouvelle ligne
-                date_ajout = datetime.now().strftime("%d/%m/%Y")
+                date_ajout = datetime.now().strftime(DATE_FORMAT)
                 
-                # Construire l'ID avec CODE_MILESIME si disponible
-                if code and milesime:
+                # Reprendre l'ID du billet de référence (CODE_MILESIME) pour que le lieu reste joint à master_data.csv
+                duplicate_index = load_duplicate_index(get_data_version())
+                billet = st.session_state.billet_info
+                code, milesime = billet['CODE'], billet['YEAR']
+                if is_valid_value(billet['#']):
+                    new_id = billet['#']
+                elif code and milesime:
                     new_id = f"{code}_{milesime}"
                 else:
-                    # Sinon utiliser un compteur
-                    max_num = 0
-                    for idx in df['#'].dropna():
-                        if isinstance(idx, str) and '_' in idx:
-                            continue
-                        try:
-                            num = int(idx)
-                            if num > max_num:
-                                max_num = num
-                        except:
-                            continue
-                    new_id = max_num + 1                
+                    # Sinon le numéro suivant le plus grand identifiant numérique (tenu à jour par l'index)
+                    new_id = duplicate_index.next_id()
                 new_row = {
                     '#': new_id,
                     'TITRE': titre,
@@ -385,29 +664,30 @@ if st.session_state.page == 'ajouter':
                     'LONGITUDE': float(st.session_state.geocoded_lon) if st.session_state.geocoded_lon else (float(longitude_input) if 'longitude_input' in locals() and longitude_input else None)
                 }
                 
-                # Ajouter la nouvelle ligne au DataFrame
-                df_new = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                
-                # Sauvegarder
-                save_data(df_new)
-                
-                st.success(f"✅ Le lieu '{titre}' a été ajouté avec succès!")
-                st.balloons()
-                
-                # Réinitialiser les infos du billet et géocodage
-                st.session_state.billet_info = None
-                st.session_state.geocoded_lat = ''
-                st.session_state.geocoded_lon = ''
-                st.session_state.geocode_message = ''
-                
-                # Revenir à la carte après 2 secondes
-                st.info("🔄 Retour à la carte...")
-                import time
-                time.sleep(2)
-                st.session_state.page = 'carte'
-                st.rerun()
+                # Refuser un billet déjà référencé au même endroit (doublon sur la carte)
+                duplicate = duplicate_index.find(new_row)
+                if duplicate:
+                    st.error(f"⚠️ {duplicate} : ce lieu n'a pas été ajouté.")
+                else:
+                    # Ajouter la nouvelle ligne à la fin du fichier
+                    append_shop(new_row)
+                    
+                    # Confirmation affichée sur la page de la carte, au prochain affichage
+                    st.session_state.flash = f"✅ Le lieu '{titre}' a été ajouté avec succès!"
+                    
+                    # Réinitialiser les infos du billet et géocodage
+                    cancel_geocoding()
+                    st.session_state.billet_info = None
+                    st.session_state.geocoded_lat = ''
+                    st.session_state.geocoded_lon = ''
+                    st.session_state.geocode_message = ''
+                    
+                    # Revenir directement à la carte
+                    st.session_state.page = 'carte'
+                    st.rerun()
         
         if cancelled:
+            cancel_geocoding()
             st.session_state.billet_info = None
             st.session_state.geocoded_lat = ''
             st.session_state.geocoded_lon = ''
@@ -415,6 +695,55 @@ if st.session_state.page == 'ajouter':
             st.session_state.page = 'carte'
             st.rerun()
 
+# PAGE D'IMPORT EN MASSE
+elif st.session_state.page == 'import':
+    st.title("📥 Import en masse")
+    st.markdown(
+        "Importez plusieurs lieux depuis un fichier **CSV** (mêmes colonnes que shop.csv) ou **JSON** "
+        "(liste d'objets). Les billets sont identifiés par `#` ou par CODE + MILESIME ; "
+        "titre, pays et ville sont complétés depuis la base de référence."
+    )
+    
+    uploaded = st.file_uploader("Fichier à importer", type=['csv', 'json'])
+    if uploaded is not None:
+        df_shops = load_data()
+        accepted, rejected = prepare_import(
+            read_upload(uploaded),
+            df_shops,
+            load_reference_data(),
+            list(df_shops.columns),
+        )
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Lignes valides", len(accepted))
+        with col2:
+            st.metric("Sans coordonnées", int((accepted['LATITUDE'].isna() | accepted['LONGITUDE'].isna()).sum()))
+        with col3:
+            st.metric("Lignes rejetées", len(rejected))
+        
+        if len(rejected) > 0:
+            with st.expander(f"✗ {len(rejected)} lignes rejetées"):
+                st.dataframe(rejected[['#', 'LIEU', 'ADRESSE', 'RAISON']])
+        if len(accepted) > 0:
+            st.dataframe(accepted[['#', 'TITRE', 'PAYS', 'VILLE', 'LIEU', 'ADRESSE', 'LATITUDE', 'LONGITUDE']])
+            
+            if st.button(f"🚀 Importer {len(accepted)} lieux", type="primary"):
+                progress_bar = st.progress(0.0, text="🌍 Géocodage des coordonnées manquantes...")
+                
+                def report(done, total):
+                    progress_bar.progress(done / total, text=f"🌍 Géocodage : {done}/{total}")
+                
+                geocoded = geocode_rows(
+                    accepted, get_app_geocoder(), cache=get_geocode_cache(), progress=report, bucket=get_rate_limiter()
+                )
+                progress_bar.progress(1.0, text="💾 Enregistrement...")
+                import_shops(accepted)
+                
+                st.session_state.flash = f"✅ {len(accepted)} lieux importés ({geocoded} géocodés)."
+                st.session_state.page = 'carte'
+                st.rerun()
+
 # PAGE CARTE (par défaut)
 elif st.session_state.page == 'carte':
     # Centrer le contenu de la page
@@ -423,80 +752,55 @@ elif st.session_state.page == 'carte':
     with col_content:
         st.title("💶 Carte des Billets 0 Euro Souvenirs")
         st.markdown("Découvrez où acheter vos billets souvenirs de 0 euros à travers l'Europe")
+        
+        # Message laissé par la page d'ajout (affiché une seule fois)
+        flash = st.session_state.pop('flash', None)
+        if flash:
+            st.success(flash)
+            st.balloons()
 
 # Créer la carte
 if len(df_display) > 0:
-    # Centre de la carte
-    center_lat = df_display['LATITUDE'].mean()
-    center_lon = df_display['LONGITUDE'].mean()
+    zoom_start = 6 if selected_ville == 'Toutes' else 13
+    with timer('marqueurs'):
+        marker_specs = get_marker_specs(pays_filter, ville_filter, data_version, note_filter)
+    # Beaucoup de lieux : la carte de base est envoyée sans marqueurs, puis seuls ceux de la vue courante
+    viewport_mode = len(df_display) > VIEWPORT_THRESHOLD
     
-    # Créer la carte Folium
-    m = folium.Map(
-        location=[center_lat, center_lon],
-        zoom_start=6 if selected_ville == 'Toutes' else 13,
-        tiles='OpenStreetMap'
+    # Carte réutilisée tant que les filtres et les données n'ont pas changé
+    m = get_map_cache().get_or_build(
+        (selected_pays, selected_ville, data_version, note_filter, viewport_mode),
+        profiled('build_map')(
+            lambda: build_map(df_display, marker_specs, zoom_start=zoom_start, with_markers=not viewport_mode)
+        )
     )
+    map_key = f"carte_{selected_pays}_{selected_ville}"
     
-    # Ajouter des marqueurs pour chaque lieu
-    for idx, row in df_display.iterrows():
-        # Construire le HTML du popup avec image si disponible
-        popup_html = f"""
-        <div style="width: 350px; font-family: Arial, sans-serif;">
-            <h4 style="margin-bottom: 10px; color: #1f77b4;">{row['TITRE']}</h4>
-        """
-        
-        # Ajouter l'image si disponible
-        if pd.notna(row['IMAGE']) and str(row['IMAGE']).strip():
-            popup_html += f"""
-            <img src="{row['IMAGE']}" style="width: 100%; max-height: 200px; object-fit: cover; border-radius: 5px; margin-bottom: 10px;">
-            """
-        
-        popup_html += f"""
-            <div style="line-height: 1.6;">
-                <b>🏢 Lieu:</b> {row['LIEU']}<br>
-                <b>🏙️ Ville:</b> {row['VILLE']}<br>
-                <b>📍 Adresse:</b> {row['ADRESSE']}<br>
-                <b>🏛️ Type:</b> {row['TYPE DE LIEU']}<br>
-                <b>💳 Mode de vente:</b> {row['Mode de vente']}<br>
-                <b>📅 Millésime:</b> {row['MILESIME']}<br>
-        """
-        
-        if pd.notna(row['PRIX INDICATIF (€)']):
-            popup_html += f"<b>💰 Prix indicatif:</b> {row['PRIX INDICATIF (€)']}<br>"
-        
-        if pd.notna(row['COMMENTAIRE']):
-            popup_html += f"<b>ℹ️ Commentaire:</b> {row['COMMENTAIRE']}<br>"
-        
-        popup_html += """
-            </div>
-        </div>
-        """
-        
-        # Couleur du marqueur selon le type de lieu
-        icon_color = 'blue'
-        if pd.notna(row['TYPE DE LIEU']):
-            if 'Monument' in str(row['TYPE DE LIEU']):
-                icon_color = 'red'
-            elif 'Musée' in str(row['TYPE DE LIEU']):
-                icon_color = 'green'
-            elif 'Office' in str(row['TYPE DE LIEU']):
-                icon_color = 'orange'
-            elif 'Boutique' in str(row['TYPE DE LIEU']):
-                icon_color = 'purple'
-        
-        folium.Marker(
-            location=[row['LATITUDE'], row['LONGITUDE']],
-            popup=folium.Popup(popup_html, max_width=370),
-            tooltip=row['TITRE'],
-            icon=folium.Icon(color=icon_color, icon='info-sign')
-        ).add_to(m)
+    visible_markers = None
+    if viewport_mode:
+        # Vue renvoyée par st_folium au rerun précédent, sinon estimée depuis le centre et le zoom initial
+        map_state = st.session_state.get(map_key) or {}
+        bounds = bounds_from_leaflet(map_state.get('bounds')) or estimate_bounds(m.location[0], m.location[1], zoom_start)
+        with timer('marqueurs'):
+            visible = load_spatial_index(pays_filter, ville_filter, data_version, note_filter).query_bbox(*expand_bounds(bounds))
+            visible_markers = build_feature_group(df_display.loc[visible], marker_specs)
+        count('marqueurs envoyés', len(visible))
     
     # Centrer la carte et la légende
     col_spacer1, col_content, col_spacer2 = st.columns([1, 8, 1])
     
     with col_content:
-        # Afficher la carte
-        st_folium(m, width=None, height=600)
+        # Afficher la carte (les déplacements ne relancent le script qu'en mode vue courante)
+        with timer('st_folium'):
+            st_folium(
+                m,
+                key=map_key,
+                width=None,
+                height=600,
+                render=False,
+                feature_group_to_add=visible_markers,
+                returned_objects=['bounds'] if viewport_mode else []
+            )
         
         # Légende des couleurs
         st.markdown("### Légende")
@@ -513,3 +817,49 @@ else:
     col_spacer1, col_content, col_spacer2 = st.columns([1, 8, 1])
     with col_content:
         st.warning("Aucun lieu avec coordonnées GPS pour cette sélection")
+
+# Couverture : nombre de lieux par billet de référence (calculée seulement quand elle est affichée)
+if st.session_state.page == 'carte':
+    col_spacer1, col_content, col_spacer2 = st.columns([1, 8, 1])
+    with col_content:
+        if st.toggle("📊 Couverture des billets", key="show_coverage"):
+            coverage = filter_coverage(load_coverage(data_version, reference_version), available_only, year_filter)
+            st.metric("Billets vendus dans au moins un lieu référencé", f"{int((coverage['LIEUX'] > 0).sum())} / {len(coverage)}")
+            st.dataframe(
+                coverage[['#', 'TITLE', 'CITY', 'COUNTRY', 'AVAILABILITY', 'LIEUX']],
+                hide_index=True
+            )
+
+# Fin de la mesure : ratio de succès du cache de géocodage, puis historique partagé
+geocode_cache = get_geocode_cache()
+perf_log = get_perf_log()
+gauge('geocode_cache_hits', geocode_cache.hits)
+gauge('geocode_cache_misses', geocode_cache.misses)
+gauge('geocode_cache_hit_ratio', round(geocode_cache.hit_ratio(), 3))
+record = finish_run()
+perf_log.add(record)
+
+if PERF_PANEL:
+    with st.sidebar.expander("⏱️ Performance"):
+        st.caption(f"Dernière exécution : {record['total_ms']:.0f} ms")
+        st.dataframe(
+            pd.DataFrame([
+                {'section': name, 'ms': timing['ms'], 'appels': timing['calls']}
+                for name, timing in sorted(record['timings'].items(), key=lambda item: -item[1]['ms'])
+            ]),
+            hide_index=True,
+        )
+        st.caption(
+            f"Cache de géocodage : {geocode_cache.hits} trouvés / {geocode_cache.misses} manquants "
+            f"({geocode_cache.hit_ratio():.0%})"
+        )
+        if record['counters']:
+            st.json(record['counters'])
+        st.markdown(f"**{len(perf_log.records)} dernières exécutions**")
+        st.dataframe(pd.DataFrame(perf_log.summary()), hide_index=True)
+        st.download_button(
+            "📥 Exporter (JSON lines)",
+            perf_log.to_jsonl(),
+            file_name="performance.jsonl",
+            mime="application/json",
+        )
@@ -0,0 +1,103 @@
+"""
+Contrôle qualité et normalisation des lieux, colonne par colonne, au chargement de shop.csv (ou de la base)
+- texte sans espaces superflus, valeurs sentinelles ('nan', 'null', '--'...) remplacées par des valeurs manquantes
+- coordonnées hors limites (ou une seule des deux renseignée) ignorées
+- DATE parsée (jj/mm/aaaa)
+- doublons de '#' et de (LIEU, ADRESSE) signalés
+Le DataFrame obtenu a des colonnes propres et typées (format compact de schema.py) : les traitements
+suivants n'ont plus à revérifier chaque valeur
+"""
+
+import pandas as pd
+
+from duplicates import place_keys
+from schema import COORDINATE_COLUMNS, DATE_FORMAT, SHOP_CATEGORIES
+
+SENTINELS = ['nan', 'null', 'none', '--', '']
+
+
+def is_valid_value(value):
+    """Vérifie si une valeur est valide (non NaN, non None, non vide)"""
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return value.strip().lower() not in SENTINELS
+    return not pd.isna(value)
+
+
+def clean_text(series):
+    """Colonne texte sans espaces de début/fin, valeurs vides ou sentinelles remplacées par des valeurs manquantes"""
+    text = series.astype('string').str.strip()
+    return text.mask(text.str.lower().isin(SENTINELS))
+
+
+class ValidationReport:
+    """Résultat du contrôle qualité d'une version des données"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.nulled = {}
+        self.invalid_coordinates = pd.Index([])
+        self.invalid_dates = pd.Index([])
+        self.duplicate_ids = pd.Index([])
+        self.duplicate_places = pd.Index([])
+
+    def summary(self):
+        """Liste de (libellé, nombre) des problèmes trouvés"""
+        return [
+            ("Valeurs vides ou invalides normalisées", sum(self.nulled.values())),
+            ("Coordonnées invalides ignorées", len(self.invalid_coordinates)),
+            ("Dates illisibles", len(self.invalid_dates)),
+            ("Lignes avec un # en double", len(self.duplicate_ids)),
+            ("Lignes avec (LIEU, ADRESSE) en double", len(self.duplicate_places)),
+        ]
+
+    def issues(self):
+        return sum(count for _, count in self.summary())
+
+
+def normalize_shops(df):
+    """
+    Normalise un DataFrame de lieux (brut, ou déjà au format compact) ; retourne (DataFrame, ValidationReport)
+    Toutes les opérations portent sur des colonnes entières
+    """
+    report = ValidationReport(len(df))
+    columns = {}
+
+    for column in df.columns:
+        if column in COORDINATE_COLUMNS or column == 'DATE':
+            continue
+        cleaned = clean_text(df[column])
+        nulled = int(cleaned.isna().sum() - df[column].isna().sum())
+        if nulled:
+            report.nulled[column] = nulled
+        columns[column] = cleaned.astype('category' if column in SHOP_CATEGORIES else 'str')
+
+    latitude = pd.to_numeric(df['LATITUDE'], errors='coerce')
+    longitude = pd.to_numeric(df['LONGITUDE'], errors='coerce')
+    invalid = (
+        (latitude.notna() & ~latitude.between(-90, 90))
+        | (longitude.notna() & ~longitude.between(-180, 180))
+        | (latitude.isna() != longitude.isna())
+        | (df['LATITUDE'].notna() & latitude.isna())
+        | (df['LONGITUDE'].notna() & longitude.isna())
+    )
+    report.invalid_coordinates = df.index[invalid]
+    columns['LATITUDE'] = latitude.mask(invalid).astype('float32')
+    columns['LONGITUDE'] = longitude.mask(invalid).astype('float32')
+
+    if pd.api.types.is_datetime64_any_dtype(df['DATE']):
+        columns['DATE'] = df['DATE']
+    else:
+        text = clean_text(df['DATE'])
+        columns['DATE'] = pd.to_datetime(text, format=DATE_FORMAT, errors='coerce')
+        report.invalid_dates = df.index[text.notna() & columns['DATE'].isna()]
+
+    df = pd.DataFrame(columns, index=df.index)[list(df.columns)]
+
+    ids = df['#']
+    report.duplicate_ids = df.index[ids.notna() & ids.duplicated(keep=False)]
+    places = place_keys(df)
+    filled = df['LIEU'].notna() & df['ADRESSE'].notna()
+    report.duplicate_places = df.index[filled & places.duplicated(keep=False)]
+    return df, report